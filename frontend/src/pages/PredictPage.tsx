@@ -38,6 +38,7 @@ import MenuBookIcon from "@mui/icons-material/MenuBook";
 import EditNoteIcon from "@mui/icons-material/EditNote";
 import Confetti from "react-confetti";
 import { TypeAnimation } from 'react-type-animation';
+import { getSessionId } from "../session";
 
 const genderOptions = [
   { value: "male", label: "Male" },
@@ -190,7 +191,7 @@ const PredictPage = ({ onPredict }: PredictPageProps) => {
     try {
       const response = await fetch("http://localhost:8000/predict", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "X-Session-Id": getSessionId() },
         body: JSON.stringify({
           gender: form.gender,
           race_ethnicity: form.race_ethnicity,
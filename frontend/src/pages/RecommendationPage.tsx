@@ -17,6 +17,7 @@ import SendIcon from '@mui/icons-material/Send';
 import Confetti from 'react-confetti';
 import DashboardIcon from '@mui/icons-material/Dashboard';
 import CheckCircleOutline from '@mui/icons-material/CheckCircleOutline';
+import { clearServerChat, getSessionId } from '../session';
 
 const resources = [
   { label: "Khan Academy", url: "https://www.khanacademy.org/" },
@@ -206,16 +207,11 @@ const RecommendationPage = ({ history }: RecommendationPageProps) => {
     const now = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
     setChatHistory(prev => [...prev, {role: 'user', content: chatInput, time: now}]);
     try {
-      const chat_history = [
-        ...chatHistory,
-        { role: 'user', content: chatInput, time: now }
-      ];
       const res = await fetch('http://localhost:8000/recommend/chat', {
         method: 'POST',
         headers: {'Content-Type': 'application/json'},
         body: JSON.stringify({
-          history: (history || []).map(h => ({ result: h.result })),
-          chat_history: chat_history,
+          session_id: getSessionId(),
           question: chatInput
         })
       });
@@ -243,10 +239,16 @@ const RecommendationPage = ({ history }: RecommendationPageProps) => {
   const handleChatMenuClose = () => {
     setChatMenuAnchorEl(null);
   };
-  const handleClearChat = () => {
+  const handleClearChat = async () => {
     setChatHistory([]);
     localStorage.removeItem('chatHistory');
     handleChatMenuClose();
+    try {
+      await clearServerChat();
+    } catch {
+      // Server unreachable: start a fresh session so the old turns never reach the prompt
+      localStorage.removeItem('sessionId');
+    }
   };
   const handleDownloadChat = () => {
     const dataStr = "data:text/json;charset=utf-8," + encodeURIComponent(JSON.stringify(chatHistory, null, 2));
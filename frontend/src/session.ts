@@ -0,0 +1,21 @@
+// Server-side session id: predictions and chat turns are stored by the API,
+// so requests only carry this id instead of the full history.
+const SESSION_KEY = "sessionId";
+
+export const getSessionId = (): string => {
+  let sessionId = localStorage.getItem(SESSION_KEY);
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    localStorage.setItem(SESSION_KEY, sessionId);
+  }
+  return sessionId;
+};
+
+// Chat turns live server-side too: clearing only localStorage would keep them in the prompt.
+export const clearServerChat = async (): Promise<void> => {
+  const res = await fetch("http://localhost:8000/session/chat", {
+    method: "DELETE",
+    headers: { "X-Session-Id": getSessionId() },
+  });
+  if (!res.ok) throw new Error(`Clearing chat failed: ${res.status}`);
+};
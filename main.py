@@ -1,9 +1,24 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Header, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from prediction_service import StudentPerformancePredictor
+from prediction_service import StudentPerformancePredictor, FRONTEND_TO_MODEL_KEYS
+from src.components.data_transformation import DataTransformationConfig
+from src.components.drift_monitor import DriftMonitor, build_reference_profile
+from src.components.explanations import ExplanationBuilder, ExplanationTable
+from src.components.session_store import SessionStore
+from src.components.admission_control import AdmissionController, AdmissionControlMiddleware
+from src.components import columnar_payload
+from src.components.incremental_trainer import IncrementalTrainer
+from src.components.recommendation_engine import RecommendationEngine
+from src.components import what_if
+from src.components.cohort_analytics import CohortAnalytics
+from src.components.live_profiler import SamplingProfiler, RequestTracer, RequestTracingMiddleware, span
+from src.logger import logging
+import secrets
+import pandas as pd
 import os
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 import cohere
 from dotenv import load_dotenv
 load_dotenv()
@@ -19,12 +34,61 @@ class StudentInput(BaseModel):
     reading_score: float = 0
     writing_score: float = 0
 
+class MultiTargetStudentInput(BaseModel):
+    gender: str
+    race_ethnicity: str
+    parental_level_of_education: str
+    lunch: str
+    test_preparation_course: str
+    math_score: Optional[float] = None
+    reading_score: Optional[float] = None
+    writing_score: Optional[float] = None
+
+class GradedResult(StudentInput):
+    # Actual exam scores for a student; all three are buffered as training rows
+    math_score: float
+    reading_score: float
+    writing_score: float
+
+class ScenarioVariation(BaseModel):
+    name: Optional[str] = None
+    # Absolute field values, e.g. {"test_preparation_course": "completed"}
+    set: Dict[str, Any] = {}
+    # Score increments, e.g. {"reading_score": 10}
+    add: Dict[str, float] = {}
+
+class ScenarioSweep(BaseModel):
+    field: str
+    # Categorical sweeps default to every known category; score sweeps use start/stop/step
+    values: Optional[List[Any]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+
+class WhatIfRequest(BaseModel):
+    student: StudentInput
+    variations: List[ScenarioVariation] = []
+    sweeps: List[ScenarioSweep] = []
+    include_recommendations: bool = False
+
+class TracingSettings(BaseModel):
+    # Fraction of requests traced; 0 turns tracing off
+    sample_rate: float
+
+class CohortQuery(BaseModel):
+    # Dataset column names, e.g. ["gender", "test preparation course"]
+    group_by: List[str] = []
+    filters: Dict[str, str] = {}
+    sources: List[str] = ["api", "bulk"]
+    histogram: bool = False
+
 class HistoryItem(BaseModel):
     result: float
     # add more fields if needed
 
 class RecommendationRequest(BaseModel):
-    history: List[HistoryItem]
+    history: Optional[List[HistoryItem]] = None
+    session_id: Optional[str] = None
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "ai"
@@ -32,9 +96,11 @@ class ChatMessage(BaseModel):
     time: Optional[str] = None
 
 class ChatRequest(BaseModel):
-    history: List[HistoryItem]
+    # With session_id only the new question is sent; history is read server-side
+    history: Optional[List[HistoryItem]] = None
     chat_history: Optional[List[ChatMessage]] = None
     question: Optional[str] = None
+    session_id: Optional[str] = None
 
 app = FastAPI(
     title="Student Performance Prediction API",
@@ -42,6 +108,14 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control is added first so CORS wraps it and 503s keep CORS headers
+admission_controller = AdmissionController()
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+# Outside admission control, so traced request time includes queueing
+request_tracer = RequestTracer()
+app.add_middleware(RequestTracingMiddleware, tracer=request_tracer)
+sampling_profiler = SamplingProfiler()
+
 # Add CORS middleware for React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -52,22 +126,221 @@ app.add_middleware(
 )
 
 MODEL_PATH = os.path.join("artifacts", "model.pkl")
-predictor = StudentPerformancePredictor(MODEL_PATH)
+COMPACT_MODEL_PATH = os.path.join("artifacts", "model_compact.joblib")
+if os.path.exists(COMPACT_MODEL_PATH):
+    MODEL_PATH = COMPACT_MODEL_PATH
+MULTI_TARGET_MODEL_PATH = os.path.join("artifacts", "multi_target_model.pkl")
+predictor = StudentPerformancePredictor(MODEL_PATH, MULTI_TARGET_MODEL_PATH)
+CATEGORY_LEVELS = predictor.category_levels()
+
+def publish_model(model):
+    global drift_monitor, explanation_table
+    # Attribute assignment is atomic; in-flight requests finish on the old model
+    predictor.model = model
+    # Both describe the previous model: off until rebuilt for the new one
+    explanation_table = None
+    drift_monitor = DriftMonitor(None)
+    try:
+        preprocessor_path = DataTransformationConfig.preprocessor_obj_file_path
+        train_path = incremental_trainer.incremental_training_config.train_data_path
+        build_reference_profile(train_path, MODEL_PATH, preprocessor_path)
+        drift_monitor = DriftMonitor.from_reference()
+        table_path = ExplanationBuilder().initiate_explanation_table(MODEL_PATH, preprocessor_path, train_path)
+        explanation_table = ExplanationTable.load(table_path) if table_path else None
+    except Exception as e:
+        logging.error(f"Rebuilding drift reference / explanations for the published model failed: {e}")
+
+incremental_trainer = IncrementalTrainer(MODEL_PATH, predictor.preprocessor, on_publish=publish_model)
+drift_monitor = DriftMonitor.from_reference()
+explanation_table = ExplanationTable.load()
+session_store = SessionStore()
+# Owns the "api" aggregates file: cohort analytics support a single uvicorn worker
+cohort_analytics = CohortAnalytics(CATEGORY_LEVELS)
+
+@app.on_event("shutdown")
+def save_cohort_analytics():
+    cohort_analytics.save()
 
 COHERE_API_KEY = os.getenv("COHERE_API_KEY", "your-cohere-api-key")  # Set your API key in env or here
 go_cohere = cohere.Client(COHERE_API_KEY)
 
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token):
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def session_history(session_id):
+    """Score and chat history of a session, bounded by the store's context window."""
+    try:
+        scores = [HistoryItem(result=p["result"]) for p in session_store.recent_predictions(session_id)]
+        turns = [ChatMessage(role=t["role"], content=t["content"]) for t in session_store.recent_chat_turns(session_id)]
+        return scores, turns
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @app.post("/predict")
-def predict(input_data: StudentInput):
+def predict(input_data: StudentInput, x_session_id: Optional[str] = Header(None)):
+    if x_session_id is not None:
+        try:
+            SessionStore.validate_session_id(x_session_id)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
     try:
         input_dict = input_data.dict()
         prediction = predictor.predict(input_dict)
+        try:
+            drift_monitor.update(input_dict, prediction)
+        except Exception as e:
+            # Monitoring must never fail a prediction that succeeded
+            logging.error(f"Drift monitor update failed: {e}")
+        if x_session_id:
+            row_id = session_store.add_prediction(x_session_id, prediction, input_dict)
+            # Only rows the session store keeps input for, so a rebuild reproduces the counts
+            cohort_analytics.update_one(input_dict, prediction, row_id)
         return {"prediction": prediction}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Batch prediction over columnar bodies: JSON by default, or Arrow IPC / MessagePack
+    selected by Content-Type, with the response format chosen from Accept.
+    """
+    content_type = request.headers.get("content-type", columnar_payload.JSON_MEDIA_TYPE)
+    body = await request.body()
+
+    def score():
+        columns = columnar_payload.decode_columns(body, content_type)
+        df = columnar_payload.validate_columns(columns, CATEGORY_LEVELS)
+        return predictor.predict_batch(df)
+
+    try:
+        predictions = await run_in_threadpool(score)
+    except columnar_payload.PayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type = columnar_payload.negotiate_response_type(request.headers.get("accept"), content_type)
+    return Response(content=columnar_payload.encode_predictions(predictions, media_type), media_type=media_type)
+
+@app.post("/feedback")
+def feedback(results: List[GradedResult], x_admin_token: Optional[str] = Header(None)):
+    """
+    Record actual exam results; a background refresh runs once enough have arrived.
+    Admin only: these rows retrain, and can replace, the served model.
+    """
+    require_admin(x_admin_token)
+    try:
+        rows = pd.DataFrame([r.dict() for r in results]).rename(columns=FRONTEND_TO_MODEL_KEYS)
+        refresh_started = incremental_trainer.add_graded_rows(rows)
+        return {"accepted": len(results), "refresh_started": refresh_started}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/incremental")
+def incremental_status():
+    return {"last_refresh": incremental_trainer.last_refresh}
+
+@app.post("/explain")
+def explain(input_data: StudentInput):
+    if explanation_table is None:
+        raise HTTPException(status_code=503, detail="Explanations are not available for the current model")
+    try:
+        return explanation_table.explain(input_data.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/monitor/admission")
+def admission_metrics():
+    return admission_controller.metrics()
+
+@app.post("/admin/profile")
+async def admin_profile(seconds: float = 10, interval_ms: Optional[float] = None, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        # Sampled from a worker thread so the event loop keeps serving (and is sampled too)
+        collapsed, _ = await run_in_threadpool(sampling_profiler.profile, seconds, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        content=collapsed,
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+@app.post("/admin/tracing")
+def admin_tracing(settings: TracingSettings, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        request_tracer.configure(settings.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"sample_rate": request_tracer.sample_rate}
+
+@app.get("/admin/traces")
+def admin_traces(limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return {
+        "sample_rate": request_tracer.sample_rate,
+        "summary": request_tracer.summary(),
+        "traces": list(request_tracer.traces)[-limit:],
+    }
+
+@app.post("/admin/analytics/cohorts")
+def admin_cohorts(query: CohortQuery, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        groups = cohort_analytics.query(query.group_by, query.filters, query.sources, query.histogram)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"group_by": query.group_by, "groups": groups}
+
+@app.post("/admin/analytics/rebuild")
+def admin_cohorts_rebuild(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    n_rows = cohort_analytics.rebuild_api(session_store)
+    return {"source": "api", "rows": n_rows}
+
+@app.get("/monitor/drift")
+def drift_report(force: bool = False):
+    return drift_monitor.report(force=force)
+
+@app.post("/predict/all")
+def predict_all(students: List[MultiTargetStudentInput]):
+    try:
+        predictions = predictor.predict_all([s.dict() for s in students])
+        return {"predictions": predictions}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/whatif")
+def predict_whatif(req: WhatIfRequest):
+    base = req.student.dict()
+    variations = [v.dict() for v in req.variations]
+    if req.include_recommendations:
+        variations += what_if.impact_variations()
+    try:
+        result = what_if.evaluate_scenarios(
+            predictor, base, variations, [s.dict() for s in req.sweeps], CATEGORY_LEVELS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result, impacts = what_if.split_impacts(result)
+    if req.include_recommendations:
+        recommendations = RecommendationEngine.generate_recommendations(base, result["baseline"])
+        result["recommendations"] = RecommendationEngine.rank_by_impact(recommendations, impacts)
+    return result
+
 @app.post("/recommend/ai")
 def ai_recommendation(req: RecommendationRequest):
+    if req.session_id:
+        req.history, _ = session_history(req.session_id)
     if not req.history:
         return {"recommendation": "No history found. Please make a prediction first!"}
     last_score = req.history[-1].result
@@ -100,6 +373,8 @@ def build_prompt(score_history, chat_history, user_question):
 
 @app.post("/recommend/chat")
 def ai_chat(req: ChatRequest):
+    if req.session_id:
+        req.history, req.chat_history = session_history(req.session_id)
     if not req.history:
         return {"answer": "No history found. Please make a prediction first!"}
     if not req.question:
@@ -112,16 +387,27 @@ def ai_chat(req: ChatRequest):
     prompt = build_prompt(score_history, chat_history, req.question)
 
     try:
-        response = go_cohere.generate(
-            model='command',  # Use 'command' for free tier
-            prompt=prompt,
-            max_tokens=300,
-            temperature=0.8,
-            stop_sequences=["User:"]
-        )
+        with span("llm_call"):
+            response = go_cohere.generate(
+                model='command',  # Use 'command' for free tier
+                prompt=prompt,
+                max_tokens=300,
+                temperature=0.8,
+                stop_sequences=["User:"]
+            )
         answer = response.generations[0].text.strip()
         if not answer:
             answer = "I'm not sure I understood your question. Could you please rephrase or provide more details?"
+        if req.session_id:
+            session_store.add_chat_turns(req.session_id, [("user", req.question), ("ai", answer)])
         return {"answer": answer}
     except Exception as e:
-        return {"answer": f"Sorry, I couldn't get a response from the AI. ({str(e)})"} 
\ No newline at end of file
+        return {"answer": f"Sorry, I couldn't get a response from the AI. ({str(e)})"}
+
+@app.delete("/session/chat")
+def clear_session_chat(x_session_id: Optional[str] = Header(None)):
+    """Forget the session's chat turns so they stop going into the prompt."""
+    try:
+        return {"deleted": session_store.clear_chat_turns(x_session_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
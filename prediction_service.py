@@ -3,6 +3,8 @@ import numpy as np
 from src.utils import load_object
 from src.logger import logging
 from src.exception import CustomException
+from src.components.live_profiler import span
+import os
 import sys
 import pandas as pd
 
@@ -38,8 +40,10 @@ FRONTEND_TO_MODEL_KEYS = {
     "writing_score": "writing score"
 }
 
+SCORE_KEYS = ["math_score", "reading_score", "writing_score"]
+
 class StudentPerformancePredictor:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, multi_target_model_path: str = None):
         try:
             # Load model artifacts
             self.model_artifacts = load_object(model_path)
@@ -52,6 +56,12 @@ class StudentPerformancePredictor:
             logging.info("Model artifacts loaded successfully")
             logging.info(f"Model expects features: {self.feature_names}")
             logging.info(f"Model input shape: {getattr(self.model, 'n_features_in_', 'unknown')}")
+
+            # Optional multi-target artifact (model + preprocessor bundled together)
+            self.multi_target_artifacts = None
+            if multi_target_model_path and os.path.exists(multi_target_model_path):
+                self.multi_target_artifacts = load_object(multi_target_model_path)
+                logging.info(f"Multi-target model loaded for {self.multi_target_artifacts['target_columns']}")
             
         except Exception as e:
             logging.error(f"Error loading model: {str(e)}")
@@ -60,29 +70,91 @@ class StudentPerformancePredictor:
     def prepare_input(self, input_data: dict) -> np.ndarray:
         """Convert input dictionary to model-ready numpy array using preprocessor"""
         try:
-            # Map frontend keys to model keys
-            model_input = {}
-            for frontend_key, model_key in FRONTEND_TO_MODEL_KEYS.items():
-                if frontend_key in input_data:
-                    model_input[model_key] = input_data[frontend_key]
-            # Build DataFrame with a single row
-            df = pd.DataFrame([model_input])
+            with span("key_mapping"):
+                # Map frontend keys to model keys
+                model_input = {}
+                for frontend_key, model_key in FRONTEND_TO_MODEL_KEYS.items():
+                    if frontend_key in input_data:
+                        model_input[model_key] = input_data[frontend_key]
+                # Build DataFrame with a single row
+                df = pd.DataFrame([model_input])
             # Transform using preprocessor
-            features = self.preprocessor.transform(df)
+            with span("preprocessor.transform"):
+                features = self.preprocessor.transform(df)
             return features
         except Exception as e:
             logging.error(f"Error preparing input: {str(e)}")
             raise CustomException(e, sys)
 
+    def category_levels(self) -> dict:
+        """Categories the preprocessor was fitted on, per model categorical column"""
+        for name, transformer, columns in self.preprocessor.transformers_:
+            if "one_hot_encoder" in getattr(transformer, "named_steps", {}):
+                encoder = transformer.named_steps["one_hot_encoder"]
+                return {column: list(levels) for column, levels in zip(columns, encoder.categories_)}
+        return {}
+
+    def predict_batch(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Vectorized prediction for a DataFrame of students, with columns named either
+        like the API fields or like the training data. One transform, one predict.
+        """
+        try:
+            with span("key_mapping"):
+                df = df.rename(columns=FRONTEND_TO_MODEL_KEYS)
+            with span("preprocessor.transform"):
+                features = self.preprocessor.transform(df)
+            with span("model.predict"):
+                predictions = np.asarray(self.model.predict(features), dtype=float)
+            return np.clip(np.round(predictions, 2), 0, 100)
+        except Exception as e:
+            logging.error(f"Batch prediction failed: {str(e)}")
+            raise CustomException(e, sys)
+
     def predict(self, input_data: dict) -> float:
         """Make prediction from input data dictionary"""
         try:
             # Prepare input features
             input_features = self.prepare_input(input_data)
             # Make prediction
-            prediction = self.model.predict(input_features)[0]
+            with span("model.predict"):
+                prediction = self.model.predict(input_features)[0]
             # Clip to reasonable score range
-            return max(0, min(100, round(prediction, 2)))
+            return max(0, min(100, round(float(prediction), 2)))
         except Exception as e:
             logging.error(f"Prediction failed: {str(e)}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    def predict_all(self, records) -> list:
+        """
+        Predict math, reading and writing scores for one or many students in a single
+        vectorized call. Scores that are missing or None are predicted; known scores
+        are returned unchanged.
+        """
+        try:
+            if self.multi_target_artifacts is None:
+                raise ValueError("Multi-target model artifact is not loaded")
+            if isinstance(records, dict):
+                records = [records]
+
+            with span("key_mapping"):
+                df = pd.DataFrame.from_records(records)
+                for key in SCORE_KEYS:
+                    if key not in df.columns:
+                        df[key] = np.nan
+                df = df.rename(columns=FRONTEND_TO_MODEL_KEYS)
+                target_columns = self.multi_target_artifacts['target_columns']
+                known = df[target_columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+            with span("preprocessor.transform"):
+                features = self.multi_target_artifacts['preprocessor'].transform(
+                    df[self.multi_target_artifacts['feature_names']]
+                )
+            with span("model.predict"):
+                predicted = np.asarray(self.multi_target_artifacts['model'].predict(features), dtype=float)
+            predicted = np.where(np.isnan(known), np.clip(np.round(predicted, 2), 0, 100), known)
+
+            return [dict(zip(SCORE_KEYS, row)) for row in predicted.tolist()]
+        except Exception as e:
+            logging.error(f"Multi-target prediction failed: {str(e)}")
+            raise CustomException(e, sys)
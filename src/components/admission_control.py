@@ -0,0 +1,234 @@
+"""
+Admission control for the FastAPI service.
+
+Requests are grouped into endpoint classes (cheap model inference vs. slow LLM
+calls), each with its own concurrency limit and bounded wait queue. A request is
+rejected with 503 + Retry-After when its class queue is full, and shed while
+queued once its client deadline (X-Request-Deadline epoch seconds, or
+X-Request-Timeout seconds from arrival) or the class queue timeout has passed.
+
+    python -m src.components.admission_control http://localhost:8000 --levels 8 32 128
+
+runs a local overload test against a running server and prints goodput per level.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from starlette.responses import JSONResponse
+
+from src.logger import logging
+
+ADMITTED = "admitted"
+REJECTED = "rejected"
+SHED = "shed"
+
+
+@dataclass
+class EndpointClassConfig:
+    paths: list
+    max_concurrency: int
+    max_queue: int
+    # Longest a request may wait for a slot, on top of any client deadline
+    queue_timeout_seconds: float
+    retry_after_seconds: int
+
+
+@dataclass
+class AdmissionControlConfig:
+    endpoint_classes: dict = field(default_factory=lambda: {
+        "inference": EndpointClassConfig(
+            paths=["/predict", "/predict/all", "/predict/batch", "/predict/whatif", "/explain"],
+            max_concurrency=2 * (os.cpu_count() or 1),
+            max_queue=64,
+            queue_timeout_seconds=1.0,
+            retry_after_seconds=1,
+        ),
+        "llm": EndpointClassConfig(
+            paths=["/recommend/chat"],
+            max_concurrency=4,
+            max_queue=16,
+            queue_timeout_seconds=10.0,
+            retry_after_seconds=5,
+        ),
+    })
+
+
+class EndpointLimiter:
+    """Concurrency limit with a bounded FIFO queue, driven from the event loop."""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.active = 0
+        self.waiters = deque()
+        self.metrics = {"admitted": 0, "rejected": 0, "shed": 0, "max_queue_depth": 0}
+
+    async def acquire(self, deadline):
+        if self.active < self.config.max_concurrency and not self.waiters:
+            self.active += 1
+            self.metrics["admitted"] += 1
+            return ADMITTED
+        if len(self.waiters) >= self.config.max_queue:
+            self.metrics["rejected"] += 1
+            return REJECTED
+
+        timeout = min(deadline - time.time(), self.config.queue_timeout_seconds)
+        if timeout <= 0:
+            self.metrics["shed"] += 1
+            return SHED
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], len(self.waiters))
+        try:
+            # release() hands its slot to us by resolving the future
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we timed out; pass it on
+                self.release()
+            self.metrics["shed"] += 1
+            return SHED
+        self.metrics["admitted"] += 1
+        return ADMITTED
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def snapshot(self):
+        return {
+            **self.metrics,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "max_concurrency": self.config.max_concurrency,
+            "max_queue": self.config.max_queue,
+        }
+
+
+class AdmissionController:
+    def __init__(self, config=None):
+        self.config = config or AdmissionControlConfig()
+        self.limiters = {name: EndpointLimiter(name, cfg) for name, cfg in self.config.endpoint_classes.items()}
+        self._by_path = {
+            path: self.limiters[name]
+            for name, cfg in self.config.endpoint_classes.items()
+            for path in cfg.paths
+        }
+
+    def limiter_for(self, path):
+        return self._by_path.get(path.rstrip("/") or "/")
+
+    def metrics(self):
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+def _client_deadline(headers, arrival):
+    try:
+        if b"x-request-deadline" in headers:
+            return float(headers[b"x-request-deadline"])
+        if b"x-request-timeout" in headers:
+            return arrival + float(headers[b"x-request-timeout"])
+    except ValueError:
+        pass
+    return float("inf")
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware so rejected requests never reach the threadpool."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        limiter = self.controller.limiter_for(scope["path"])
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        deadline = _client_deadline(dict(scope["headers"]), time.time())
+        outcome = await limiter.acquire(deadline)
+        if outcome != ADMITTED:
+            detail = "Server overloaded" if outcome == REJECTED else "Request deadline expired while queued"
+            response = JSONResponse(
+                {"detail": detail},
+                status_code=503,
+                headers={"Retry-After": str(limiter.config.retry_after_seconds)},
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def run_overload_test(base_url, levels=(8, 32, 128), duration_seconds=10.0, path="/predict", timeout_seconds=2.0):
+    """
+    Offer increasing numbers of concurrent clients to a running server and measure
+    goodput: successful responses per second that arrived within the client timeout.
+    """
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from src.components.synthetic_data import SyntheticDataGenerator
+
+    payloads = [json.dumps(p).encode() for p in SyntheticDataGenerator.from_csv().iter_api_payloads(1000)]
+
+    def client(worker_id, stop_at):
+        counts = {"ok": 0, "late": 0, "rejected": 0, "error": 0}
+        i = worker_id
+        while time.time() < stop_at:
+            start = time.time()
+            request = urllib.request.Request(
+                base_url + path,
+                data=payloads[i % len(payloads)],
+                headers={"Content-Type": "application/json", "X-Request-Timeout": str(timeout_seconds)},
+            )
+            i += 1
+            try:
+                with urllib.request.urlopen(request, timeout=timeout_seconds * 2) as response:
+                    response.read()
+                counts["ok" if time.time() - start <= timeout_seconds else "late"] += 1
+            except urllib.error.HTTPError as e:
+                counts["rejected" if e.code == 503 else "error"] += 1
+                if e.code == 503:
+                    time.sleep(min(float(e.headers.get("Retry-After", 1)), 0.1))
+            except Exception:
+                counts["error"] += 1
+        return counts
+
+    results = []
+    for level in levels:
+        stop_at = time.time() + duration_seconds
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            totals = {"ok": 0, "late": 0, "rejected": 0, "error": 0}
+            for counts in pool.map(lambda w: client(w, stop_at), range(level)):
+                for key, value in counts.items():
+                    totals[key] += value
+        results.append({"concurrency": level, "goodput_per_second": totals["ok"] / duration_seconds, **totals})
+        logging.info(f"Overload test level {level}: {results[-1]}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local overload test against a running API")
+    parser.add_argument("base_url")
+    parser.add_argument("--levels", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/predict")
+    args = parser.parse_args()
+    for row in run_overload_test(args.base_url, args.levels, args.duration, args.path):
+        print(row)
@@ -0,0 +1,376 @@
+"""
+Materialized cohort aggregates of predicted math scores.
+
+Every prediction updates one cell of a small cube indexed by (gender,
+race/ethnicity, parental level of education, lunch, test preparation course),
+with one extra "other" level per column for unseen values. Each cell holds
+count, sum, sum of squares and a 101-bin histogram, so a group-by over any
+subset of the columns is a sum over cube axes: its cost depends on the number
+of categories, never on the number of rows scored.
+
+Aggregates are kept per source: "api" for /predict requests sent with a session
+id (the session store keeps their input, so they can be rebuilt), and "bulk" for
+bulk-scored files, with one partition per output file so scoring the same output
+again replaces its rows instead of adding them twice. Each partition is its own
+file: the API process and every bulk scoring run write only their own partitions
+and read the others' latest files on query.
+
+    python -m src.components.cohort_analytics rebuild --bulk-output artifacts/scored.csv
+
+recomputes the bulk partitions of the given outputs. The api aggregates are
+rebuilt from the session store by the running service, or with --api while it
+is stopped.
+
+The "api" partition is owned by one process: run the API with a single uvicorn
+worker, otherwise each worker overwrites the others' api.pkl.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.components.data_transformation import CATEGORICAL_COLUMNS, DataTransformationConfig
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object
+
+SOURCES = ("api", "bulk")
+N_SCORE_BINS = 101
+# API field for each cohort column
+FRONTEND_KEYS = {
+    "gender": "gender",
+    "race/ethnicity": "race_ethnicity",
+    "parental level of education": "parental_level_of_education",
+    "lunch": "lunch",
+    "test preparation course": "test_preparation_course",
+}
+
+
+@dataclass
+class CohortAnalyticsConfig:
+    aggregates_dir = os.path.join("artifacts", "cohort_aggregates")
+    # Served predictions between two saves of the "api" aggregates
+    save_every_rows: int = 1000
+
+
+def category_levels_from_preprocessor(preprocessor_path=None):
+    """Categories of each cohort column, as fitted by the preprocessor's one-hot encoder."""
+    preprocessor = load_object(preprocessor_path or DataTransformationConfig.preprocessor_obj_file_path)
+    for name, transformer, columns in preprocessor.transformers_:
+        if "one_hot_encoder" in getattr(transformer, "named_steps", {}):
+            encoder = transformer.named_steps["one_hot_encoder"]
+            return {column: list(levels) for column, levels in zip(columns, encoder.categories_)}
+    return {}
+
+
+class _Aggregates:
+    def __init__(self, n_cells):
+        self.count = np.zeros(n_cells, dtype=np.int64)
+        self.sum = np.zeros(n_cells)
+        self.sum_squares = np.zeros(n_cells)
+        self.histogram = np.zeros((n_cells, N_SCORE_BINS), dtype=np.int64)
+
+
+class CohortAnalytics:
+    def __init__(self, category_levels, owned_sources=("api",), config=None):
+        self.cohort_analytics_config = config or CohortAnalyticsConfig()
+        self.levels = {column: list(category_levels.get(column, [])) for column in CATEGORICAL_COLUMNS}
+        self._index = {column: {level: i for i, level in enumerate(levels)} for column, levels in self.levels.items()}
+        # Every column gets one extra slot for values outside its known levels
+        self.shape = tuple(len(levels) + 1 for levels in self.levels.values())
+        self.n_cells = int(np.prod(self.shape))
+        self._lock = threading.Lock()
+        # Partition name ("api", or "bulk/<output key>") -> aggregates; owned ones are written by this instance
+        self._partitions = {}
+        self._owned = set()
+        self._loaded_mtime = {}
+        self._unsaved_rows = 0
+        # (session row id, cell, prediction) of rows served while rebuild_api() runs
+        self._pending = None
+        for source in SOURCES:
+            self._load_source(source)
+        # "bulk" partitions are claimed per output file with own_output()
+        for source in owned_sources:
+            if source != "bulk":
+                self._partitions.setdefault(source, _Aggregates(self.n_cells))
+                self._owned.add(source)
+
+    @staticmethod
+    def _partition(source, output_path=None):
+        if source != "bulk":
+            return source
+        if output_path is None:
+            raise ValueError("Bulk aggregates are kept per output file; output_path is required")
+        key = hashlib.sha1(os.path.abspath(output_path).encode()).hexdigest()[:16]
+        return f"bulk/{key}"
+
+    def _partition_path(self, name):
+        return os.path.join(self.cohort_analytics_config.aggregates_dir, *name.split("/")) + ".pkl"
+
+    def _load_source(self, source):
+        """Reload the partitions of source that other processes wrote since the last load."""
+        if source == "bulk":
+            bulk_dir = os.path.join(self.cohort_analytics_config.aggregates_dir, "bulk")
+            files = os.listdir(bulk_dir) if os.path.isdir(bulk_dir) else []
+            names = {f"bulk/{file_name[:-4]}" for file_name in files if file_name.endswith(".pkl")}
+            # Deleting an output's file drops its rows
+            for name in [n for n in self._partitions if n.startswith("bulk/") and n not in names and n not in self._owned]:
+                del self._partitions[name]
+                self._loaded_mtime.pop(name, None)
+        else:
+            names = {source}
+
+        for name in names - self._owned:
+            path = self._partition_path(name)
+            if not os.path.exists(path):
+                continue
+            mtime = os.path.getmtime(path)
+            if self._loaded_mtime.get(name) == mtime:
+                continue
+            state = load_object(path)
+            if state["levels"] != self.levels:
+                logging.warning(f"Cohort aggregates in {path} use different category levels; ignoring them")
+                continue
+            self._partitions[name] = state["aggregates"]
+            self._loaded_mtime[name] = mtime
+
+    def own_output(self, output_path, reset=True):
+        """
+        Make this instance write the bulk partition of output_path. reset starts it
+        empty (a new scoring run replaces the file's rows); a resumed run keeps it.
+        """
+        name = self._partition("bulk", output_path)
+        with self._lock:
+            if reset or name not in self._partitions:
+                self._partitions[name] = _Aggregates(self.n_cells)
+            self._owned.add(name)
+        self.save()
+
+    def save(self):
+        with self._lock:
+            for name in self._owned:
+                path = self._partition_path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                save_object(path + ".tmp", {"levels": self.levels, "aggregates": self._partitions[name]})
+                os.replace(path + ".tmp", path)
+                self._loaded_mtime[name] = os.path.getmtime(path)
+            self._unsaved_rows = 0
+
+    def _cells(self, df):
+        codes = []
+        for column, levels in self.levels.items():
+            column_codes = pd.Categorical(df[column], categories=levels).codes.astype(np.int64)
+            codes.append(np.where(column_codes < 0, len(levels), column_codes))
+        return np.ravel_multi_index(codes, self.shape)
+
+    def _add(self, aggregates, cells, predictions):
+        predictions = np.asarray(predictions, dtype=float)
+        finite = np.isfinite(predictions)
+        if not finite.all():
+            # A NaN would turn the cell's sum and mean into NaN for good
+            logging.warning(f"Skipping {int((~finite).sum())} non-finite predictions in cohort aggregates")
+            cells, predictions = cells[finite], predictions[finite]
+        bins = np.rint(np.clip(predictions, 0, 100)).astype(np.int64)
+        aggregates.count += np.bincount(cells, minlength=self.n_cells)
+        aggregates.sum += np.bincount(cells, weights=predictions, minlength=self.n_cells)
+        aggregates.sum_squares += np.bincount(cells, weights=predictions ** 2, minlength=self.n_cells)
+        aggregates.histogram += np.bincount(
+            cells * N_SCORE_BINS + bins, minlength=self.n_cells * N_SCORE_BINS
+        ).reshape(self.n_cells, N_SCORE_BINS)
+
+    def update(self, df, predictions, source="api", output_path=None):
+        """
+        Add scored rows; df columns may be named like the dataset or like the API
+        fields. Bulk rows go to the partition of their output_path.
+        """
+        name = self._partition(source, output_path)
+        if source == "bulk" and name not in self._owned:
+            # An unclaimed partition is replaced by its file (or dropped) on the next query
+            raise ValueError(f"Bulk output {output_path} was not claimed with own_output()")
+        cells = self._cells(df.rename(columns={key: column for column, key in FRONTEND_KEYS.items()}))
+        with self._lock:
+            self._add(self._partitions.setdefault(name, _Aggregates(self.n_cells)), cells, predictions)
+            self._unsaved_rows += len(cells)
+            save_due = source == "api" and self._unsaved_rows >= self.cohort_analytics_config.save_every_rows
+        if save_due:
+            self.save()
+
+    def _add_one(self, aggregates, cell, prediction):
+        aggregates.count[cell] += 1
+        aggregates.sum[cell] += prediction
+        aggregates.sum_squares[cell] += prediction * prediction
+        aggregates.histogram[cell, int(min(max(prediction, 0.0), 100.0) + 0.5)] += 1
+
+    def update_one(self, input_data: dict, prediction: float, row_id: int):
+        """
+        Add one served /predict request whose input is kept in the session store
+        (API field names); row_id is its session store row.
+        """
+        prediction = float(prediction)
+        if not np.isfinite(prediction):
+            logging.warning("Skipping a non-finite prediction in cohort aggregates")
+            return
+        position = [
+            self._index[column].get(input_data.get(key), len(self.levels[column]))
+            for column, key in FRONTEND_KEYS.items()
+        ]
+        cell = int(np.ravel_multi_index(position, self.shape))
+        with self._lock:
+            self._add_one(self._partitions.setdefault("api", _Aggregates(self.n_cells)), cell, prediction)
+            if self._pending is not None:
+                self._pending.append((row_id, cell, prediction))
+            self._unsaved_rows += 1
+            save_due = self._unsaved_rows >= self.cohort_analytics_config.save_every_rows
+        if save_due:
+            self.save()
+
+    def query(self, group_by=(), filters=None, sources=SOURCES, histogram=False):
+        """
+        Count, mean, std and p10/p50/p90 of predicted scores per group of the
+        group_by columns, restricted to rows matching filters {column: value}.
+        """
+        unknown = [c for c in list(group_by) + list(filters or {}) if c not in self.levels]
+        if unknown:
+            raise ValueError(f"Unknown cohort columns {unknown}; choose from {CATEGORICAL_COLUMNS}")
+        if not set(sources) <= set(SOURCES):
+            raise ValueError(f"Unknown sources {sorted(set(sources) - set(SOURCES))}; choose from {list(SOURCES)}")
+
+        with self._lock:
+            for source in sources:
+                self._load_source(source)
+            selected = [a for name, a in self._partitions.items() if name.split("/")[0] in sources]
+            empty = _Aggregates(self.n_cells)
+            count = sum((a.count for a in selected), empty.count).reshape(self.shape)
+            total = sum((a.sum for a in selected), empty.sum).reshape(self.shape)
+            squares = sum((a.sum_squares for a in selected), empty.sum_squares).reshape(self.shape)
+            hist = sum((a.histogram for a in selected), empty.histogram).reshape(self.shape + (N_SCORE_BINS,))
+
+        columns = list(self.levels)
+        for column, value in (filters or {}).items():
+            axis = columns.index(column)
+            position = self._index[column].get(value, len(self.levels[column]))
+            count, total, squares, hist = (
+                np.take(a, [position], axis=axis) for a in (count, total, squares, hist)
+            )
+        other_axes = tuple(i for i, column in enumerate(columns) if column not in group_by)
+        count, total, squares = (a.sum(axis=other_axes) for a in (count, total, squares))
+        hist = hist.sum(axis=other_axes)
+
+        groups = []
+        kept = [column for column in columns if column in group_by]
+        for position in np.ndindex(count.shape):
+            n = int(count[position])
+            if n == 0:
+                continue
+            mean = total[position] / n
+            cdf = np.cumsum(hist[position]) / n
+            group = {
+                column: (self.levels[column] + ["other"])[i]
+                for column, i in zip(kept, position)
+            }
+            group.update({
+                "count": n,
+                "mean": float(mean),
+                "std": float(np.sqrt(max(squares[position] / n - mean * mean, 0.0))),
+                "p10": int(np.searchsorted(cdf, 0.1)),
+                "p50": int(np.searchsorted(cdf, 0.5)),
+                "p90": int(np.searchsorted(cdf, 0.9)),
+            })
+            if histogram:
+                group["histogram"] = hist[position].tolist()
+            groups.append(group)
+        return groups
+
+    def _aggregate(self, scored_chunks):
+        # Outside the lock: queries keep reading the old partition until the swap
+        fresh, n_rows = _Aggregates(self.n_cells), 0
+        for df, predictions in scored_chunks:
+            self._add(fresh, self._cells(df), predictions)
+            n_rows += len(df)
+        return fresh, n_rows
+
+    def rebuild(self, output_path, scored_chunks):
+        """Recompute the bulk partition of output_path from (DataFrame, predictions) chunks and save it."""
+        try:
+            name = self._partition("bulk", output_path)
+            fresh, n_rows = self._aggregate(scored_chunks)
+            with self._lock:
+                self._partitions[name] = fresh
+                self._owned.add(name)
+            self.save()
+            logging.info(f"Cohort aggregates for {name} rebuilt from {n_rows} rows")
+            return n_rows
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def rebuild_api(self, session_store):
+        """
+        Recompute the "api" partition from the session store while requests keep
+        arriving: stored rows up to the current last row id are aggregated, and rows
+        served meanwhile (ids above it, buffered by update_one) are replayed before
+        the swap, so none are lost or counted twice.
+        """
+        try:
+            with self._lock:
+                self._pending = []
+            max_id = session_store.max_prediction_id()
+            fresh, n_rows = self._aggregate(iter_session_predictions(session_store, max_id=max_id))
+            with self._lock:
+                for row_id, cell, prediction in self._pending:
+                    if row_id > max_id:
+                        self._add_one(fresh, cell, prediction)
+                        n_rows += 1
+                self._partitions["api"] = fresh
+                self._owned.add("api")
+            self.save()
+            logging.info(f"Cohort aggregates for api rebuilt from {n_rows} rows")
+            return n_rows
+        except Exception as e:
+            raise CustomException(e, sys)
+        finally:
+            with self._lock:
+                self._pending = None
+
+
+def iter_session_predictions(session_store, chunk_size=50000, max_id=None):
+    """(DataFrame, predictions) chunks of stored /predict requests that kept their input."""
+    from prediction_service import FRONTEND_TO_MODEL_KEYS
+    for rows in session_store.iter_predictions(chunk_size, max_id=max_id):
+        df = pd.DataFrame.from_records([input_data for _, input_data in rows]).rename(columns=FRONTEND_TO_MODEL_KEYS)
+        yield df, np.array([result for result, _ in rows], dtype=float)
+
+
+def iter_bulk_outputs(output_paths, chunk_size=50000):
+    """(DataFrame, predictions) chunks of bulk scoring output files."""
+    from src.pipeline.bulk_scoring import PREDICTION_COLUMN, iter_input_chunks
+    for path in output_paths:
+        for chunk in iter_input_chunks(path, chunk_size):
+            yield chunk, chunk[PREDICTION_COLUMN].to_numpy(dtype=float)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cohort analytics aggregates")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute aggregates from the source data")
+    rebuild_parser.add_argument("--bulk-output", nargs="*", default=[], help="Bulk scoring output files")
+    rebuild_parser.add_argument("--api", action="store_true", help="Also rebuild the api aggregates (service stopped)")
+    rebuild_parser.add_argument("--preprocessor-path", default=DataTransformationConfig.preprocessor_obj_file_path)
+    args = parser.parse_args(argv)
+
+    analytics = CohortAnalytics(
+        category_levels_from_preprocessor(args.preprocessor_path), owned_sources=("api",) if args.api else ()
+    )
+    if args.api:
+        from src.components.session_store import SessionStore
+        print(f"api: {analytics.rebuild_api(SessionStore())} rows")
+    for output_path in args.bulk_output:
+        n_rows = analytics.rebuild(output_path, iter_bulk_outputs([output_path]))
+        print(f"bulk {output_path}: {n_rows} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Columnar request/response bodies for high-volume prediction calls.
+
+A batch is one array per StudentInput field, sent as JSON (default), an Arrow
+IPC stream or MessagePack. Columns are validated with vectorized membership and
+range checks and handed to the batch preprocessing path as a DataFrame built
+directly from the arrays, without per-row dicts or Pydantic objects.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack"}
+
+CATEGORICAL_FIELDS = {
+    "gender": "gender",
+    "race_ethnicity": "race/ethnicity",
+    "parental_level_of_education": "parental level of education",
+    "lunch": "lunch",
+    "test_preparation_course": "test preparation course",
+}
+SCORE_FIELDS = {
+    "math_score": "math score",
+    "reading_score": "reading score",
+    "writing_score": "writing score",
+}
+REQUIRED_SCORE_FIELDS = ["reading_score", "writing_score"]
+
+
+class PayloadError(ValueError):
+    """Malformed or invalid columnar payload; status is the HTTP code to answer with."""
+
+    def __init__(self, message, status_code=422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _media_type(header_value):
+    return (header_value or JSON_MEDIA_TYPE).split(";")[0].strip().lower()
+
+
+def decode_columns(body: bytes, content_type: str) -> dict:
+    """Decode a request body into {field: numpy array}."""
+    media_type = _media_type(content_type)
+    try:
+        if media_type == ARROW_MEDIA_TYPE:
+            import pyarrow as pa
+            table = pa.ipc.open_stream(body).read_all()
+            return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        if media_type in MSGPACK_MEDIA_TYPES:
+            import msgpack
+            payload = msgpack.unpackb(body, raw=False)
+        elif media_type == JSON_MEDIA_TYPE:
+            payload = json.loads(body)
+            if isinstance(payload, list):
+                # Row-oriented JSON is accepted too and pivoted once by pandas
+                return {name: column.to_numpy() for name, column in pd.DataFrame.from_records(payload).items()}
+        else:
+            raise PayloadError(f"Unsupported content type: {media_type}", status_code=415)
+    except ImportError:
+        raise PayloadError(f"{media_type} support is not installed on this server", status_code=415)
+    except PayloadError:
+        raise
+    except Exception as e:
+        raise PayloadError(f"Could not decode {media_type} body: {e}", status_code=400)
+
+    if not isinstance(payload, dict):
+        raise PayloadError("Columnar body must map each field to an array")
+    try:
+        return {name: np.asarray(values) for name, values in payload.items()}
+    except ValueError as e:
+        # Ragged nested lists
+        raise PayloadError(f"Could not read columns: {e}")
+
+
+def validate_columns(columns: dict, category_levels: dict) -> pd.DataFrame:
+    """
+    Vectorized validation of a columnar batch. category_levels maps each model
+    categorical column to its allowed values. Returns a DataFrame with model
+    column names, ready for the preprocessor.
+    """
+    missing = [f for f in list(CATEGORICAL_FIELDS) + REQUIRED_SCORE_FIELDS if f not in columns]
+    if missing:
+        raise PayloadError(f"Missing fields: {missing}")
+    not_arrays = [name for name, values in columns.items() if getattr(values, "ndim", None) != 1]
+    if not_arrays:
+        raise PayloadError(f"Fields must be one-dimensional arrays: {not_arrays}")
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) != 1:
+        raise PayloadError("All columns must have the same length")
+
+    data, errors = {}, []
+    for field_name, column in CATEGORICAL_FIELDS.items():
+        values = columns[field_name].astype(object)
+        invalid = ~np.isin(values, category_levels[column])
+        if invalid.any():
+            rows = np.flatnonzero(invalid)[:5].tolist()
+            errors.append(f"{field_name}: invalid values at rows {rows}")
+        data[column] = values
+
+    for field_name, column in SCORE_FIELDS.items():
+        if field_name not in columns:
+            continue
+        try:
+            values = columns[field_name].astype(float)
+        except (TypeError, ValueError):
+            errors.append(f"{field_name}: not numeric")
+            continue
+        invalid = ~np.isfinite(values) | (values < 0) | (values > 100)
+        if invalid.any():
+            rows = np.flatnonzero(invalid)[:5].tolist()
+            errors.append(f"{field_name}: out of range [0, 100] at rows {rows}")
+        data[column] = values
+
+    if errors:
+        raise PayloadError("; ".join(errors))
+    return pd.DataFrame(data)
+
+
+def negotiate_response_type(accept: str, request_content_type: str) -> str:
+    """Response media type from Accept, falling back to the request's type, then JSON."""
+    for candidate in (accept or "").split(","):
+        media_type = _media_type(candidate)
+        if media_type in (JSON_MEDIA_TYPE, ARROW_MEDIA_TYPE) or media_type in MSGPACK_MEDIA_TYPES:
+            return MSGPACK_MEDIA_TYPE if media_type in MSGPACK_MEDIA_TYPES else media_type
+    request_type = _media_type(request_content_type)
+    if request_type == ARROW_MEDIA_TYPE:
+        return ARROW_MEDIA_TYPE
+    if request_type in MSGPACK_MEDIA_TYPES:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def encode_predictions(predictions: np.ndarray, media_type: str) -> bytes:
+    predictions = np.asarray(predictions, dtype=float)
+    if media_type == ARROW_MEDIA_TYPE:
+        import pyarrow as pa
+        table = pa.table({"prediction": predictions})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if media_type == MSGPACK_MEDIA_TYPE:
+        import msgpack
+        return msgpack.packb({"prediction": predictions.tolist()})
+    return json.dumps({"prediction": predictions.tolist()}).encode()
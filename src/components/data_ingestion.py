@@ -17,6 +17,8 @@ class DataIngestionConfig:
     train_data_path: str = os.path.join("artifacts", "train.csv")
     test_data_path: str = os.path.join("artifacts", "test.csv")
     raw_data_path: str = os.path.join("artifacts", "data.csv")
+    # Point at a synthetic .csv/.parquet from src.components.synthetic_data to train at scale
+    source_data_path: str = os.path.join("data", "StudentsPerformance.csv")
     
 class DataIngestion:
     def __init__(self):
@@ -25,7 +27,8 @@ class DataIngestion:
     def initiate_data_ingestion(self):
         logging.info("Data Ingestion started")
         try:
-            df = pd.read_csv("data/StudentsPerformance.csv")
+            source_path = self.ingestion_config.source_data_path
+            df = pd.read_parquet(source_path) if source_path.endswith(".parquet") else pd.read_csv(source_path)
             logging.info("Dataset read as pandas dataframe")
 
             os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
@@ -46,12 +49,6 @@ class DataIngestion:
             raise CustomException(e, sys)
         
 if __name__ == "__main__":
-    obj = DataIngestion()
-    train_data, test_data = obj.initiate_data_ingestion()
-
-    data_transformation = DataTransformation()
-    train_arr, test_arr, _ = data_transformation.initiate_data_transformation(train_data, test_data)
-
-    modeltrainer = ModelTrainer()
-    print(modeltrainer.initiate_model_trainer(train_arr, test_arr)
-)
\ No newline at end of file
+    # Full training run; stages with unchanged inputs are reused from the pipeline cache
+    from src.pipeline.train_pipeline import main
+    main()
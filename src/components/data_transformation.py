@@ -14,32 +14,42 @@ import os
 
 from src.utils import save_object
 
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "race/ethnicity",
+    "parental level of education",
+    "lunch",
+    "test preparation course",
+]
+SCORE_COLUMNS = ["math score", "reading score", "writing score"]
+
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path=os.path.join('artifacts',"preprocessor.pkl")
+    multi_target_preprocessor_obj_file_path=os.path.join('artifacts',"multi_target_preprocessor.pkl")
+    # Transformed training rows held out from model training, for tuning steps after it
+    validation_fraction: float = 0.1
+    random_state: int = 42
 
 class DataTransformation:
     def __init__(self):
         self.data_transformation_config=DataTransformationConfig()
 
-    def get_data_transformer_object(self):
+    def get_data_transformer_object(self, numerical_columns=None, add_missing_indicator=False):
         '''
         This function is responsible for data transformation
 
+        add_missing_indicator appends a was-missing flag per score column, used by
+        the multi-target preprocessor where any subset of scores may be unknown.
         '''
         try:
-            numerical_columns = ["writing score", "reading score"]
-            categorical_columns = [
-                "gender",
-                "race/ethnicity",
-                "parental level of education",
-                "lunch",
-                "test preparation course",
-            ]
+            if numerical_columns is None:
+                numerical_columns = ["writing score", "reading score"]
+            categorical_columns = list(CATEGORICAL_COLUMNS)
 
             num_pipeline= Pipeline(
                 steps=[
-                ("imputer",SimpleImputer(strategy="median")),
+                ("imputer",SimpleImputer(strategy="median", add_indicator=add_missing_indicator)),
                 ("scaler",StandardScaler())
 
                 ]
@@ -73,7 +83,7 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e,sys)
         
-    def initiate_data_transformation(self,train_path,test_path):
+    def initiate_data_transformation(self,train_path,test_path,target_column_name="math score"):
 
         try:
             train_df=pd.read_csv(train_path)
@@ -83,10 +93,8 @@ class DataTransformation:
 
             logging.info("Obtaining preprocessing object")
 
-            preprocessing_obj=self.get_data_transformer_object()
-
-            target_column_name="math score"
-            numerical_columns = ["writing score", "reading score"]
+            numerical_columns = [col for col in SCORE_COLUMNS if col != target_column_name][::-1]
+            preprocessing_obj=self.get_data_transformer_object(numerical_columns)
             
 
             input_feature_train_df=train_df.drop(columns=[target_column_name],axis=1)
@@ -122,4 +130,95 @@ class DataTransformation:
                 self.data_transformation_config.preprocessor_obj_file_path,
             )
         except Exception as e:
-            raise CustomException(e,sys)
\ No newline at end of file
+            raise CustomException(e,sys)
+
+    def split_validation(self, train_arr):
+        '''
+        Splits transformed training rows into (fit rows, validation rows). The validation
+        rows are never trained on, so steps tuned after training (model compaction)
+        score the model on data it has not seen.
+        '''
+        config = self.data_transformation_config
+        rows = np.random.default_rng(config.random_state).permutation(len(train_arr))
+        n_val = max(1, int(len(train_arr) * config.validation_fraction))
+        return train_arr[np.sort(rows[n_val:])], train_arr[np.sort(rows[:n_val])]
+
+    @staticmethod
+    def mask_known_scores(df):
+        '''
+        Expands every row into one copy per non-empty subset of hidden scores, so a
+        single model learns to predict any subject from whichever scores are known.
+        Copies of the same student stay adjacent; masked_row_groups() labels them so
+        CV folds can keep them together.
+        '''
+        df = df.reset_index(drop=True)
+        masked_frames = []
+        n_scores = len(SCORE_COLUMNS)
+        for mask in range(1, 2 ** n_scores):
+            masked = df.copy()
+            for i, col in enumerate(SCORE_COLUMNS):
+                if mask & (1 << i):
+                    masked[col] = np.nan
+            masked_frames.append(masked)
+        return pd.concat(masked_frames).sort_index(kind="stable").reset_index(drop=True)
+
+    @staticmethod
+    def masked_row_groups(n_rows):
+        '''Source student of each row of a mask_known_scores() output, for GroupKFold.'''
+        return np.arange(n_rows) // (2 ** len(SCORE_COLUMNS) - 1)
+
+    @staticmethod
+    def missing_indicator_columns(preprocessor):
+        '''
+        Column of the transformed array flagging each of SCORE_COLUMNS as missing,
+        for a fitted multi-target preprocessor (num_pipeline comes first: scores, then flags).
+        '''
+        imputer = preprocessor.named_transformers_["num_pipeline"].named_steps["imputer"]
+        flagged = list(imputer.indicator_.features_)
+        if len(flagged) != len(SCORE_COLUMNS):
+            raise ValueError("Every score column needs a missing indicator; was the preprocessor fitted on masked data?")
+        return [len(SCORE_COLUMNS) + flagged.index(i) for i in range(len(SCORE_COLUMNS))]
+
+    def initiate_multi_target_transformation(self,train_path,test_path):
+        '''
+        Single preprocessing pass for predicting math, reading and writing together.
+        The last len(SCORE_COLUMNS) columns of the returned arrays are the targets.
+        '''
+        try:
+            train_df=pd.read_csv(train_path)
+            test_df=pd.read_csv(test_path)
+
+            logging.info("Read train and test data for multi-target transformation")
+
+            preprocessing_obj=self.get_data_transformer_object(
+                numerical_columns=SCORE_COLUMNS, add_missing_indicator=True
+            )
+
+            masked_train_df=self.mask_known_scores(train_df)
+            masked_test_df=self.mask_known_scores(test_df)
+
+            input_feature_train_arr=preprocessing_obj.fit_transform(masked_train_df[CATEGORICAL_COLUMNS + SCORE_COLUMNS])
+            input_feature_test_arr=preprocessing_obj.transform(masked_test_df[CATEGORICAL_COLUMNS + SCORE_COLUMNS])
+
+            # Targets are the unmasked scores, repeated once per mask
+            n_masks = len(masked_train_df) // len(train_df)
+            target_train_arr=np.repeat(train_df[SCORE_COLUMNS].to_numpy(dtype=float), n_masks, axis=0)
+            target_test_arr=np.repeat(test_df[SCORE_COLUMNS].to_numpy(dtype=float), n_masks, axis=0)
+
+            train_arr = np.c_[input_feature_train_arr, target_train_arr]
+            test_arr = np.c_[input_feature_test_arr, target_test_arr]
+
+            logging.info(f"Multi-target arrays built: train {train_arr.shape}, test {test_arr.shape}")
+
+            save_object(
+                file_path=self.data_transformation_config.multi_target_preprocessor_obj_file_path,
+                obj=preprocessing_obj
+            )
+
+            return (
+                train_arr,
+                test_arr,
+                self.data_transformation_config.multi_target_preprocessor_obj_file_path,
+            )
+        except Exception as e:
+            raise CustomException(e,sys)
@@ -0,0 +1,257 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object
+
+# Request keys monitored, mapped to their column in train.csv
+MONITORED_CATEGORICALS = {
+    "gender": "gender",
+    "race_ethnicity": "race/ethnicity",
+    "parental_level_of_education": "parental level of education",
+    "lunch": "lunch",
+    "test_preparation_course": "test preparation course",
+}
+MONITORED_SCORES = {
+    "reading_score": "reading score",
+    "writing_score": "writing score",
+}
+PREDICTION_KEY = "prediction"
+
+# Scores and predictions live in [0, 100]; one bin per point is an exact
+# fixed-size quantile sketch at integer resolution.
+N_SCORE_BINS = 101
+
+
+@dataclass
+class DriftMonitorConfig:
+    reference_profile_file_path = os.path.join("artifacts", "drift_reference.pkl")
+    compare_interval_seconds: float = 60.0
+    n_shards: int = 16
+    psi_warning_threshold: float = 0.1
+    psi_drift_threshold: float = 0.2
+
+
+def _score_bin(value):
+    value = float(value)
+    if value != value:  # NaN
+        return 0
+    return int(min(max(value, 0.0), 100.0) + 0.5)
+
+
+def _score_histogram(values):
+    values = np.clip(np.nan_to_num(np.asarray(values, dtype=float)), 0, 100)
+    return np.bincount(np.rint(values).astype(int), minlength=N_SCORE_BINS).tolist()
+
+
+def build_reference_profile(train_path, model_path, preprocessor_path, profile_path=None):
+    """
+    Profile of the training data (category counts, score and prediction histograms)
+    that live traffic is compared against. Saved next to the model artifacts.
+    """
+    try:
+        profile_path = profile_path or DriftMonitorConfig.reference_profile_file_path
+        train_df = pd.read_csv(train_path)
+        model = load_object(model_path)['model']
+        preprocessor = load_object(preprocessor_path)
+        predictions = model.predict(preprocessor.transform(train_df.drop(columns=["math score"])))
+
+        profile = {
+            "n_rows": len(train_df),
+            "categorical": {
+                key: train_df[column].str.lower().value_counts().to_dict()
+                for key, column in MONITORED_CATEGORICALS.items()
+            },
+            "numeric": {
+                key: _score_histogram(train_df[column])
+                for key, column in MONITORED_SCORES.items()
+            },
+        }
+        profile["numeric"][PREDICTION_KEY] = _score_histogram(predictions)
+
+        save_object(profile_path, profile)
+        logging.info(f"Drift reference profile saved to {profile_path}")
+        return profile
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+class _Shard:
+    """One stripe of counters; request threads hashed to it serialize on its lock."""
+
+    def __init__(self, category_index):
+        self.lock = threading.Lock()
+        self.categorical = {key: [0] * (len(index) + 1) for key, index in category_index.items()}
+        self.numeric = {key: [0] * N_SCORE_BINS for key in list(MONITORED_SCORES) + [PREDICTION_KEY]}
+        self.n_requests = 0
+
+
+class DriftMonitor:
+    """
+    Constant-memory drift monitor for /predict traffic.
+
+    Request threads update one of n_shards lock-striped shards of counters (chosen
+    by thread id, so contention stays low); shards are summed when a report is
+    requested. Memory is fixed: one counter per known category plus one for unseen
+    values and 101 bins per score, times n_shards, however many threads come and go.
+    """
+
+    def __init__(self, reference_profile=None, config=None):
+        self.config = config or DriftMonitorConfig()
+        self.reference = reference_profile
+        categories = (reference_profile or {}).get("categorical", {})
+        self._category_index = {
+            key: {category: i for i, category in enumerate(sorted(categories.get(key, {})))}
+            for key in MONITORED_CATEGORICALS
+        }
+        self._shards = [_Shard(self._category_index) for _ in range(self.config.n_shards)]
+        self._last_report = None
+        self._last_report_time = 0.0
+
+    @classmethod
+    def from_reference(cls, profile_path=None, config=None):
+        config = config or DriftMonitorConfig()
+        profile_path = profile_path or config.reference_profile_file_path
+        if not os.path.exists(profile_path):
+            logging.warning(f"No drift reference profile at {profile_path}; drift metrics disabled")
+            return cls(None, config)
+        return cls(load_object(profile_path), config)
+
+    def _shard(self):
+        # Native thread ids are small sequential integers, so they spread evenly over shards
+        return self._shards[threading.get_native_id() % len(self._shards)]
+
+    def update(self, input_data: dict, prediction: float):
+        """Record one request. Called on the request path, must stay cheap."""
+        positions = []
+        for key, index in self._category_index.items():
+            value = input_data.get(key)
+            positions.append((key, index.get(value.lower() if isinstance(value, str) else value, len(index))))
+        bins = [(key, _score_bin(input_data.get(key, 0))) for key in MONITORED_SCORES]
+        bins.append((PREDICTION_KEY, _score_bin(prediction)))
+
+        shard = self._shard()
+        with shard.lock:
+            shard.n_requests += 1
+            for key, position in positions:
+                shard.categorical[key][position] += 1
+            for key, position in bins:
+                shard.numeric[key][position] += 1
+
+    def snapshot(self):
+        """Merge all shards into one set of live counts."""
+        shards = []
+        for shard in self._shards:
+            with shard.lock:
+                copy = _Shard(self._category_index)
+                copy.categorical = {key: list(counts) for key, counts in shard.categorical.items()}
+                copy.numeric = {key: list(counts) for key, counts in shard.numeric.items()}
+                copy.n_requests = shard.n_requests
+            shards.append(copy)
+        categorical = {
+            key: np.sum([s.categorical[key] for s in shards], axis=0) if shards else np.zeros(len(index) + 1)
+            for key, index in self._category_index.items()
+        }
+        numeric = {
+            key: np.sum([s.numeric[key] for s in shards], axis=0) if shards else np.zeros(N_SCORE_BINS)
+            for key in list(MONITORED_SCORES) + [PREDICTION_KEY]
+        }
+        return sum(s.n_requests for s in shards), categorical, numeric
+
+    @staticmethod
+    def _psi(expected, actual, eps=1e-4):
+        expected = np.asarray(expected, dtype=float)
+        actual = np.asarray(actual, dtype=float)
+        expected = np.clip(expected / max(expected.sum(), 1.0), eps, None)
+        actual = np.clip(actual / max(actual.sum(), 1.0), eps, None)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+    @staticmethod
+    def _quantiles(histogram, qs=(0.1, 0.5, 0.9)):
+        cdf = np.cumsum(histogram) / max(np.sum(histogram), 1)
+        return {f"p{int(q * 100)}": int(np.searchsorted(cdf, q)) for q in qs}
+
+    def _status(self, psi):
+        if psi >= self.config.psi_drift_threshold:
+            return "drift"
+        if psi >= self.config.psi_warning_threshold:
+            return "warning"
+        return "ok"
+
+    def compute_report(self):
+        n_requests, categorical, numeric = self.snapshot()
+        report = {"n_requests": int(n_requests), "reference_loaded": self.reference is not None, "features": {}}
+        if self.reference is None or n_requests == 0:
+            return report
+
+        for key, index in self._category_index.items():
+            reference_counts = self.reference["categorical"][key]
+            expected = [reference_counts[c] for c in sorted(reference_counts)] + [0]
+            live = categorical[key]
+            psi = self._psi(expected, live)
+            report["features"][key] = {
+                "psi": psi,
+                "unseen_fraction": float(live[-1] / n_requests),
+                "status": self._status(psi),
+            }
+
+        for key, live in numeric.items():
+            expected = np.asarray(self.reference["numeric"][key], dtype=float)
+            reference_cdf = np.cumsum(expected) / expected.sum()
+            # PSI over reference deciles so sparse unit bins do not dominate
+            starts = np.unique(np.r_[0, np.searchsorted(reference_cdf, np.linspace(0.1, 0.9, 9)) + 1])
+            starts = starts[starts < N_SCORE_BINS]
+            psi = self._psi(np.add.reduceat(expected, starts), np.add.reduceat(live, starts))
+            ks = float(np.max(np.abs(reference_cdf - np.cumsum(live) / n_requests)))
+            report["features"][key] = {
+                "psi": psi,
+                "ks": ks,
+                "reference_quantiles": self._quantiles(expected),
+                "live_quantiles": self._quantiles(live),
+                "status": self._status(psi),
+            }
+
+        drifted = [k for k, v in report["features"].items() if v["status"] == "drift"]
+        if drifted:
+            logging.warning(f"Data drift detected on: {drifted}")
+        return report
+
+    def report(self, force=False):
+        """Drift report, recomputed at most every compare_interval_seconds."""
+        now = time.monotonic()
+        if force or self._last_report is None or now - self._last_report_time >= self.config.compare_interval_seconds:
+            self._last_report = self.compute_report()
+            self._last_report_time = now
+        return self._last_report
+
+
+def benchmark_update_cost(n_updates=200000, profile_path=None):
+    """Average cost of DriftMonitor.update in microseconds per request."""
+    monitor = DriftMonitor.from_reference(profile_path)
+    sample = {
+        "gender": "female",
+        "race_ethnicity": "group C",
+        "parental_level_of_education": "some college",
+        "lunch": "standard",
+        "test_preparation_course": "none",
+        "reading_score": 72,
+        "writing_score": 70,
+    }
+    start = time.perf_counter()
+    for _ in range(n_updates):
+        monitor.update(sample, 66.5)
+    elapsed = time.perf_counter() - start
+    result = {"n_updates": n_updates, "microseconds_per_update": elapsed / n_updates * 1e6}
+    logging.info(f"Drift monitor update benchmark: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    print(benchmark_update_cost())
@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from src.components.data_transformation import CATEGORICAL_COLUMNS
+from src.components.model_compactor import CompactTreeEnsemble
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object
+
+SCORE_FEATURES = ["reading score", "writing score"]
+EXPLAINED_FEATURES = CATEGORICAL_COLUMNS + SCORE_FEATURES
+
+# API field for each explained feature
+FEATURE_TO_FRONTEND_KEYS = {
+    "gender": "gender",
+    "race/ethnicity": "race_ethnicity",
+    "parental level of education": "parental_level_of_education",
+    "lunch": "lunch",
+    "test preparation course": "test_preparation_course",
+    "reading score": "reading_score",
+    "writing score": "writing_score",
+}
+
+
+@dataclass
+class ExplanationConfig:
+    explanation_table_file_path = os.path.join("artifacts", "explanations.pkl")
+    score_bin_width: int = 10
+    n_jobs: int = -1
+
+
+# ---------------------------------------------------------------------------
+# Path-dependent TreeSHAP (Lundberg et al., Algorithm 2), vectorized over rows.
+# The recursion over the tree is the same for every row; only the "one fraction"
+# (whether a row follows a branch) differs, so path weights are row vectors.
+# ---------------------------------------------------------------------------
+
+def _extend_path(d, z, o, w, zero_fraction, one_fraction, feature, n_rows):
+    depth = len(d)
+    d, z, o = d + [feature], z + [zero_fraction], o + [one_fraction]
+    w = w + [np.ones(n_rows) if depth == 0 else np.zeros(n_rows)]
+    for i in range(depth - 1, -1, -1):
+        w[i + 1] = w[i + 1] + one_fraction * w[i] * (i + 1) / (depth + 1)
+        w[i] = zero_fraction * w[i] * (depth - i) / (depth + 1)
+    return d, z, o, w
+
+
+def _unwind_path(d, z, o, w, index):
+    depth = len(d) - 1
+    one_fraction, zero_fraction = o[index], z[index]
+    has_one = one_fraction != 0
+    safe_one = np.where(has_one, one_fraction, 1.0)
+    w = list(w)
+    next_one = w[depth]
+    for j in range(depth - 1, -1, -1):
+        from_one = next_one * (depth + 1) / ((j + 1) * safe_one)
+        from_zero = w[j] * (depth + 1) / (zero_fraction * (depth - j)) if zero_fraction else np.zeros_like(w[j])
+        next_one = w[j] - from_one * zero_fraction * (depth - j) / (depth + 1)
+        w[j] = np.where(has_one, from_one, from_zero)
+    return d[:index] + d[index + 1:], z[:index] + z[index + 1:], o[:index] + o[index + 1:], w[:depth]
+
+
+def _unwound_path_sum(z, o, w, index):
+    depth = len(w) - 1
+    one_fraction, zero_fraction = o[index], z[index]
+    has_one = one_fraction != 0
+    safe_one = np.where(has_one, one_fraction, 1.0)
+    total_one, total_zero = np.zeros_like(w[0]), np.zeros_like(w[0])
+    next_one = w[depth]
+    for j in range(depth - 1, -1, -1):
+        tmp = next_one * (depth + 1) / ((j + 1) * safe_one)
+        total_one = total_one + tmp
+        next_one = w[j] - tmp * zero_fraction * (depth - j) / (depth + 1)
+        if zero_fraction:
+            total_zero = total_zero + (w[j] / zero_fraction) * (depth + 1) / (depth - j)
+    return np.where(has_one, total_one, total_zero)
+
+
+def tree_shap(tree, root, X, n_features):
+    """SHAP values (rows x features) of one tree, given as flat node arrays rooted at root."""
+    left, right, feature, threshold, value, cover = tree
+    n_rows = X.shape[0]
+    phi = np.zeros((n_rows, n_features))
+
+    def recurse(node, d, z, o, w, zero_fraction, one_fraction, parent_feature):
+        d, z, o, w = _extend_path(d, z, o, w, zero_fraction, one_fraction, parent_feature, n_rows)
+        if left[node] < 0:
+            for i in range(1, len(d)):
+                phi[:, d[i]] += _unwound_path_sum(z, o, w, i) * (o[i] - z[i]) * value[node]
+            return
+        split = int(feature[node])
+        goes_left = (X[:, split] <= threshold[node]).astype(float)
+        incoming_zero, incoming_one = 1.0, np.ones(n_rows)
+        if split in d:
+            k = d.index(split)
+            incoming_zero, incoming_one = z[k], o[k]
+            d, z, o, w = _unwind_path(d, z, o, w, k)
+        recurse(left[node], d, z, o, w, incoming_zero * cover[left[node]] / cover[node], incoming_one * goes_left, split)
+        recurse(right[node], d, z, o, w, incoming_zero * cover[right[node]] / cover[node], incoming_one * (1 - goes_left), split)
+
+    recurse(root, [], [], [], [], 1.0, np.ones(n_rows), -1)
+    return phi
+
+
+def _tree_expected_value(tree, root):
+    left, right, _, _, value, cover = tree
+    expected, stack = 0.0, [root]
+    while stack:
+        node = stack.pop()
+        if left[node] < 0:
+            expected += cover[node] * value[node]
+        else:
+            stack.extend((left[node], right[node]))
+    return expected / cover[root]
+
+
+def _sklearn_tree_arrays(tree):
+    return (
+        tree.children_left, tree.children_right, tree.feature, tree.threshold,
+        tree.value[:, 0, 0], tree.weighted_n_node_samples,
+    )
+
+
+def _tree_ensemble(model):
+    """(trees as (arrays, root), per-tree weights, bias) for supported tree models, else None."""
+    if isinstance(model, CompactTreeEnsemble):
+        arrays = (model.left, model.right, model.feature, model.threshold, model.value[:, 0], model.cover)
+        return [(arrays, int(root)) for root in model.roots], model.tree_weights, float(model.bias[0])
+    if isinstance(model, DecisionTreeRegressor):
+        return [(_sklearn_tree_arrays(model.tree_), 0)], [1.0], 0.0
+    if isinstance(model, RandomForestRegressor):
+        trees = [(_sklearn_tree_arrays(e.tree_), 0) for e in model.estimators_]
+        return trees, [1.0 / len(trees)] * len(trees), 0.0
+    if isinstance(model, GradientBoostingRegressor) and hasattr(model.init_, "constant_"):
+        trees = [(_sklearn_tree_arrays(stage[0].tree_), 0) for stage in model.estimators_]
+        return trees, [model.learning_rate] * len(trees), float(np.ravel(model.init_.constant_)[0])
+    return None
+
+
+def _raw_feature_matrix(preprocessor, n_transformed):
+    """0/1 matrix summing transformed columns (one-hot levels) back into raw features."""
+    raw_columns = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder" or transformer == "drop":
+            continue
+        if "one_hot_encoder" in getattr(transformer, "named_steps", {}):
+            encoder = transformer.named_steps["one_hot_encoder"]
+            for column, categories in zip(columns, encoder.categories_):
+                raw_columns.extend([column] * len(categories))
+        else:
+            raw_columns.extend(columns)
+    if len(raw_columns) != n_transformed:
+        raise ValueError(f"Cannot map {n_transformed} transformed features back to raw features")
+    mapping = np.zeros((n_transformed, len(EXPLAINED_FEATURES)))
+    for i, column in enumerate(raw_columns):
+        mapping[i, EXPLAINED_FEATURES.index(column)] = 1.0
+    return mapping
+
+
+class UnsupportedModelError(ValueError):
+    """The model type has no SHAP implementation here."""
+
+
+class ExplanationBuilder:
+    def __init__(self):
+        self.explanation_config = ExplanationConfig()
+
+    def shap_values(self, model, X, X_background=None):
+        """
+        Transformed-feature SHAP values and base value. Path-dependent TreeSHAP in
+        NumPy for sklearn trees and compact ensembles, the libraries' own TreeSHAP
+        for XGBoost/CatBoost, and the exact linear solution for LinearRegression.
+        """
+        ensemble = _tree_ensemble(model)
+        if ensemble is not None:
+            trees, weights, bias = ensemble
+            X = np.asarray(X, dtype=np.float32)
+            per_tree = Parallel(n_jobs=self.explanation_config.n_jobs)(
+                delayed(tree_shap)(arrays, root, X, X.shape[1]) for arrays, root in trees
+            )
+            phi = sum(weight * values for weight, values in zip(weights, per_tree))
+            base = bias + sum(weight * _tree_expected_value(arrays, root) for (arrays, root), weight in zip(trees, weights))
+            return phi, base
+
+        model_type = type(model).__name__
+        if model_type == "XGBRegressor":
+            import xgboost
+            contributions = model.get_booster().predict(xgboost.DMatrix(X), pred_contribs=True)
+            return contributions[:, :-1], float(contributions[0, -1])
+        if model_type == "CatBoostRegressor":
+            from catboost import Pool
+            contributions = model.get_feature_importance(data=Pool(X), type="ShapValues")
+            return contributions[:, :-1], float(contributions[0, -1])
+        if isinstance(model, LinearRegression) and X_background is not None:
+            mean = np.asarray(X_background).mean(axis=0)
+            return (np.asarray(X) - mean) * model.coef_, float(model.predict(mean[None, :])[0])
+
+        raise UnsupportedModelError(f"Explanations are not supported for {model_type}")
+
+    def build_grid(self, categories):
+        """Every categorical combination crossed with every reading/writing score bin."""
+        width = self.explanation_config.score_bin_width
+        bin_centers = np.arange(0, 100, width) + width / 2
+        levels = [np.asarray(categories[column], dtype=object) for column in CATEGORICAL_COLUMNS]
+        levels += [bin_centers, bin_centers]
+        shape = tuple(len(level) for level in levels)
+        codes = np.indices(shape).reshape(len(shape), -1)
+        grid = pd.DataFrame({
+            column: level[code] for column, level, code in zip(EXPLAINED_FEATURES, levels, codes)
+        })
+        return grid, shape
+
+    def initiate_explanation_table(self, model_path, preprocessor_path, train_path):
+        """
+        Precompute per-feature contributions for the whole input grid and save them
+        as an indexed table (row = ravel_multi_index of the feature codes). For an
+        unsupported model the previous table is removed and None is returned, so
+        /explain never serves another model's contributions.
+        """
+        logging.info("Explanation table build started")
+        try:
+            start = time.perf_counter()
+            model_artifacts = load_object(model_path)
+            model = model_artifacts['model']
+            preprocessor = load_object(preprocessor_path)
+
+            categorical_pipeline = next(
+                transformer for _, transformer, _ in preprocessor.transformers_
+                if "one_hot_encoder" in getattr(transformer, "named_steps", {})
+            )
+            encoder = categorical_pipeline.named_steps["one_hot_encoder"]
+            categories = {column: list(levels) for column, levels in zip(CATEGORICAL_COLUMNS, encoder.categories_)}
+
+            grid, shape = self.build_grid(categories)
+            X_grid = preprocessor.transform(grid)
+            X_background = preprocessor.transform(pd.read_csv(train_path))
+
+            try:
+                phi, base_value = self.shap_values(model, X_grid, X_background)
+            except UnsupportedModelError as e:
+                table_path = self.explanation_config.explanation_table_file_path
+                logging.warning(f"{e}; skipping the explanation table")
+                if os.path.exists(table_path):
+                    os.remove(table_path)
+                    logging.warning(f"Removed stale explanation table {table_path}")
+                return None
+            contributions = phi @ _raw_feature_matrix(preprocessor, X_grid.shape[1])
+            predictions = np.asarray(model.predict(X_grid), dtype=float)
+
+            additivity_error = float(np.max(np.abs(base_value + contributions.sum(axis=1) - predictions)))
+            logging.info(f"Explanation additivity error (max |base + sum(phi) - prediction|): {additivity_error:.6f}")
+
+            table = {
+                "features": EXPLAINED_FEATURES,
+                "categories": {column: [c.lower() for c in levels] for column, levels in categories.items()},
+                "score_bin_width": self.explanation_config.score_bin_width,
+                "shape": shape,
+                "base_value": float(base_value),
+                "contributions": contributions.astype(np.float32),
+                "predictions": predictions.astype(np.float32),
+                "model_type": type(model).__name__,
+            }
+            save_object(self.explanation_config.explanation_table_file_path, table)
+            logging.info(
+                f"Explanation table with {len(grid)} rows built in {time.perf_counter() - start:.1f}s "
+                f"and saved to {self.explanation_config.explanation_table_file_path}"
+            )
+            return self.explanation_config.explanation_table_file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+class ExplanationTable:
+    """Serving-side lookup of precomputed contributions; O(1) per request."""
+
+    def __init__(self, table):
+        self.table = table
+        self.features = table["features"]
+        self.shape = table["shape"]
+        self.n_bins = self.shape[-1]
+        self.bin_width = table["score_bin_width"]
+        self.category_codes = {
+            column: {category: code for code, category in enumerate(levels)}
+            for column, levels in table["categories"].items()
+        }
+        # Row strides of the C-ordered grid
+        self.strides = np.cumprod((1,) + tuple(self.shape[::-1]))[:-1][::-1].tolist()
+
+    @classmethod
+    def load(cls, table_path=None):
+        table_path = table_path or ExplanationConfig.explanation_table_file_path
+        if not os.path.exists(table_path):
+            logging.warning(f"No explanation table at {table_path}; /explain disabled")
+            return None
+        return cls(load_object(table_path))
+
+    def _score_bin(self, score):
+        return min(max(int(float(score) // self.bin_width), 0), self.n_bins - 1)
+
+    def explain(self, input_data: dict) -> dict:
+        row = 0
+        for column, stride in zip(self.features, self.strides):
+            value = input_data.get(FEATURE_TO_FRONTEND_KEYS[column])
+            if column in self.category_codes:
+                code = self.category_codes[column].get(str(value).lower())
+                if code is None:
+                    raise ValueError(f"Unknown {column}: {value}")
+            else:
+                code = self._score_bin(value or 0)
+            row += code * stride
+        contributions = self.table["contributions"][row]
+        return {
+            "base_value": self.table["base_value"],
+            "prediction": float(self.table["predictions"][row]),
+            "contributions": {
+                FEATURE_TO_FRONTEND_KEYS[column]: float(value)
+                for column, value in zip(self.features, contributions)
+            },
+            "score_bin_width": self.bin_width,
+        }
@@ -0,0 +1,212 @@
+import copy
+import os
+import sys
+import threading
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import r2_score
+
+from src.components.data_transformation import CATEGORICAL_COLUMNS, SCORE_COLUMNS
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object
+
+BUFFER_COLUMNS = CATEGORICAL_COLUMNS + SCORE_COLUMNS
+
+
+@dataclass
+class IncrementalTrainingConfig:
+    buffer_file_path = os.path.join("artifacts", "graded_buffer.csv")
+    train_data_path = os.path.join("artifacts", "train.csv")
+    test_data_path = os.path.join("artifacts", "test.csv")
+    target_column_name: str = "math score"
+    # New graded rows needed before a background refresh starts
+    refresh_every_rows: int = 100
+    # Most recent buffered rows used per refresh; older rows are dropped from the buffer file
+    max_buffer_rows: int = 20000
+    # Trees / boosting iterations added by a warm-start refresh
+    warm_start_estimators: int = 20
+    # Model size a warm start may grow to; past it refreshes fit a residual head instead
+    max_estimators: int = 1000
+    # Candidate is promoted only if its R² on test.csv >= current R² + min_r2_gain
+    min_r2_gain: float = 0.0
+    random_state: int = 42
+
+
+class ResidualCorrectedModel:
+    """Base model plus an SGD linear head fitted on its residuals over recent graded rows."""
+
+    def __init__(self, base_model, head):
+        self.base_model = base_model
+        self.head = head
+        self.n_features_in_ = getattr(base_model, "n_features_in_", None)
+
+    def predict(self, X):
+        return np.asarray(self.base_model.predict(X), dtype=float) + self.head.predict(X)
+
+
+class IncrementalTrainer:
+    """
+    Learns from newly graded results without the full ingestion/tuning pipeline.
+
+    Graded rows are appended to a buffer; every refresh_every_rows rows a background
+    thread refreshes the serving model (warm start for forests and boosting up to
+    max_estimators, an SGD residual head otherwise), compares R² on the original
+    test split against the current model and, only if it is not worse, publishes
+    the new artifact and swaps it in. Graded rows are never part of that check, so
+    they cannot approve the model they trained.
+    """
+
+    def __init__(self, model_path, preprocessor, on_publish=None, config=None):
+        self.incremental_training_config = config or IncrementalTrainingConfig()
+        self.model_path = model_path
+        self.preprocessor = preprocessor
+        self.on_publish = on_publish
+        self._buffer_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pending_rows = 0
+        self.last_refresh = None
+
+    def add_graded_rows(self, rows: pd.DataFrame):
+        """Append graded rows (dataset column names) and start a refresh when enough arrived."""
+        config = self.incremental_training_config
+        rows = rows[BUFFER_COLUMNS]
+        with self._buffer_lock:
+            write_header = not os.path.exists(config.buffer_file_path)
+            rows.to_csv(config.buffer_file_path, mode="a", header=write_header, index=False)
+            self._pending_rows += len(rows)
+            start_refresh = self._pending_rows >= config.refresh_every_rows
+            if start_refresh:
+                self._pending_rows = 0
+        if start_refresh:
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return start_refresh
+
+    def _split_features(self, df):
+        target = self.incremental_training_config.target_column_name
+        return self.preprocessor.transform(df.drop(columns=[target])), df[target].to_numpy(dtype=float)
+
+    @staticmethod
+    def _n_estimators(model):
+        """Trees / boosting iterations in a fitted model, or None for other models."""
+        if isinstance(model, (RandomForestRegressor, GradientBoostingRegressor)):
+            return model.n_estimators
+        if isinstance(model, HistGradientBoostingRegressor):
+            return model.n_iter_
+        if type(model).__name__ == "XGBRegressor":
+            return model.get_booster().num_boosted_rounds()
+        if type(model).__name__ == "CatBoostRegressor":
+            return model.tree_count_
+        return None
+
+    def _warm_start(self, model, X, y):
+        """Continue training a copy of model on X, y, or return None if it cannot or is at max_estimators."""
+        config = self.incremental_training_config
+        extra = config.warm_start_estimators
+        n_estimators = self._n_estimators(model)
+        if n_estimators is not None and n_estimators + extra > config.max_estimators:
+            logging.info(f"Model has {n_estimators} estimators, warm start capped at {config.max_estimators}")
+            return None
+        if isinstance(model, (RandomForestRegressor, GradientBoostingRegressor)):
+            candidate = copy.deepcopy(model)
+            candidate.set_params(warm_start=True, n_estimators=model.n_estimators + extra)
+            return candidate.fit(X, y)
+        if isinstance(model, HistGradientBoostingRegressor):
+            candidate = copy.deepcopy(model)
+            candidate.set_params(warm_start=True, max_iter=model.n_iter_ + extra, early_stopping=False)
+            return candidate.fit(X, y)
+        if type(model).__name__ == "XGBRegressor":
+            candidate = copy.deepcopy(model)
+            candidate.set_params(n_estimators=extra)
+            return candidate.fit(X, y, xgb_model=model.get_booster())
+        if type(model).__name__ == "CatBoostRegressor":
+            candidate = model.copy()
+            candidate.set_params(iterations=extra)
+            return candidate.fit(X, y, init_model=model)
+        return None
+
+    def _residual_head(self, model, X, y):
+        base = model.base_model if isinstance(model, ResidualCorrectedModel) else model
+        head = SGDRegressor(alpha=1e-3, max_iter=1000, tol=1e-4, random_state=self.incremental_training_config.random_state)
+        head.fit(X, y - np.asarray(base.predict(X), dtype=float))
+        return ResidualCorrectedModel(base, head)
+
+    def _refresh_in_background(self):
+        # An exception would otherwise end in the thread's excepthook with no trace in last_refresh
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Incremental refresh failed: {e}")
+            self.last_refresh = {"error": str(e), "promoted": False}
+
+    def refresh(self):
+        """Build, evaluate and (if not worse on the test split) publish a refreshed model."""
+        if not self._refresh_lock.acquire(blocking=False):
+            logging.info("Incremental refresh already running, skipping")
+            return None
+        try:
+            config = self.incremental_training_config
+            with self._buffer_lock:
+                graded = pd.read_csv(config.buffer_file_path)
+                if len(graded) > config.max_buffer_rows:
+                    # Keep the file at the rows a refresh uses, so each read stays bounded
+                    graded = graded.tail(config.max_buffer_rows)
+                    graded.to_csv(config.buffer_file_path + ".tmp", index=False)
+                    os.replace(config.buffer_file_path + ".tmp", config.buffer_file_path)
+
+            if graded.empty:
+                return None
+
+            # Replay as many original rows as new ones so the update does not forget
+            replay = pd.read_csv(config.train_data_path).sample(
+                n=len(graded), replace=True, random_state=config.random_state
+            )[BUFFER_COLUMNS]
+            X_train, y_train = self._split_features(pd.concat([graded, replay], ignore_index=True))
+            # Trusted rows only: graded rows come from callers and must not vote on promotion
+            X_holdout, y_holdout = self._split_features(pd.read_csv(config.test_data_path)[BUFFER_COLUMNS])
+
+            model_artifacts = load_object(self.model_path)
+            current = model_artifacts['model']
+            candidate = self._warm_start(current, X_train, y_train)
+            strategy = "warm_start"
+            if candidate is None:
+                X_new, y_new = self._split_features(graded)
+                candidate = self._residual_head(current, X_new, y_new)
+                strategy = "residual_head"
+
+            current_r2 = r2_score(y_holdout, current.predict(X_holdout))
+            candidate_r2 = r2_score(y_holdout, candidate.predict(X_holdout))
+            promoted = candidate_r2 >= current_r2 + config.min_r2_gain
+
+            self.last_refresh = {
+                "strategy": strategy,
+                "graded_rows": len(graded),
+                "current_r2": current_r2,
+                "candidate_r2": candidate_r2,
+                "promoted": promoted,
+            }
+            logging.info(f"Incremental refresh: {self.last_refresh}")
+
+            if promoted:
+                # Write beside the artifact and rename so readers never see a partial file
+                tmp_path = self.model_path + ".tmp"
+                published = {**model_artifacts, 'model': candidate}
+                if self.model_path.endswith(".joblib"):
+                    # load_object reads .joblib paths with joblib, not dill
+                    joblib.dump(published, tmp_path, compress=3)
+                else:
+                    save_object(tmp_path, published)
+                os.replace(tmp_path, self.model_path)
+                if self.on_publish is not None:
+                    self.on_publish(candidate)
+            return self.last_refresh
+
+        except Exception as e:
+            raise CustomException(e, sys)
+        finally:
+            self._refresh_lock.release()
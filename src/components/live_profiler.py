@@ -0,0 +1,164 @@
+"""
+Profiling a running API process.
+
+SamplingProfiler snapshots the stack of every thread (sys._current_frames) at a
+fixed interval for a bounded duration and returns collapsed stacks, one
+"thread;frame;frame count" line per distinct stack, which flamegraph.pl,
+speedscope and inferno read directly.
+
+RequestTracer records per-stage spans (key mapping, preprocessor.transform,
+model.predict, the LLM call) for a sampled fraction of requests. With a sample
+rate of 0 (the default) the middleware is a single attribute check and span()
+returns a shared no-op context manager, so tracing costs nothing when off.
+"""
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.logger import logging
+
+
+@dataclass
+class LiveProfilerConfig:
+    max_profile_seconds: float = 60.0
+    default_interval_ms: float = 5.0
+    # Recent traced requests kept in memory
+    max_traces: int = 1000
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler over all threads; one profile runs at a time."""
+
+    def __init__(self, config=None):
+        self.live_profiler_config = config or LiveProfilerConfig()
+        self._running = threading.Lock()
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+    def profile(self, seconds, interval_ms=None):
+        """Sample for `seconds` and return (collapsed stack text, number of samples)."""
+        config = self.live_profiler_config
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            seconds = min(float(seconds), config.max_profile_seconds)
+            interval = (interval_ms or config.default_interval_ms) / 1000.0
+            own_ident = threading.get_ident()
+            stacks, n_samples = Counter(), 0
+
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(labels))] += 1
+                n_samples += 1
+                time.sleep(interval)
+
+            logging.info(f"Sampling profile: {n_samples} samples over {seconds:.1f}s, {len(stacks)} distinct stacks")
+            collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+            return collapsed + "\n", n_samples
+        finally:
+            self._running.release()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.trace["spans"].append((self.name, (time.perf_counter() - self.start) * 1000))
+        return False
+
+
+def span(name):
+    """Time a stage of the current request if it is being traced; a no-op otherwise."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+class RequestTracer:
+    def __init__(self, config=None):
+        self.live_profiler_config = config or LiveProfilerConfig()
+        self.sample_rate = 0.0
+        self.traces = deque(maxlen=self.live_profiler_config.max_traces)
+
+    def configure(self, sample_rate):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        logging.info(f"Request tracing sample rate set to {sample_rate}")
+
+    def summary(self):
+        """Per-stage count and latency percentiles (ms) over the retained traces."""
+        durations = defaultdict(list)
+        for trace in list(self.traces):
+            durations["request"].append(trace["total_ms"])
+            for name, ms in trace["spans"]:
+                durations[name].append(ms)
+        return {
+            name: {
+                "count": len(values),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "p99_ms": float(np.percentile(values, 99)),
+            }
+            for name, values in durations.items()
+        }
+
+
+class RequestTracingMiddleware:
+    """Pure ASGI middleware that opens a trace for a sampled fraction of requests."""
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if self.tracer.sample_rate <= 0.0 or scope["type"] != "http" or random.random() >= self.tracer.sample_rate:
+            return await self.app(scope, receive, send)
+
+        trace = {"path": scope["path"], "started_at": time.time(), "spans": []}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            trace["total_ms"] = (time.perf_counter() - start) * 1000
+            _current_trace.reset(token)
+            self.tracer.traces.append(trace)
@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import load_object
+
+# Fitted attributes only needed for diagnostics during training
+TRAINING_ONLY_ATTRIBUTES = [
+    "oob_score_",
+    "oob_prediction_",
+    "oob_improvement_",
+    "oob_scores_",
+    "train_score_",
+    "validation_score_",
+    "estimators_samples_",
+    "_rng",
+]
+
+
+@dataclass
+class ModelCompactorConfig:
+    compact_model_file_path = os.path.join("artifacts", "model_compact.joblib")
+    # Largest R² loss (absolute) accepted from float32 casting and pruning
+    max_r2_drop: float = 0.002
+    prune_trees: bool = True
+    compress: int = 3
+
+
+class CompactTreeEnsemble:
+    """
+    Flat float32 representation of sklearn regression trees, forests and gradient
+    boosting. All trees are concatenated into shared node arrays and a batch is
+    traversed level by level with NumPy, so no per-tree Python objects are loaded.
+    """
+
+    def __init__(self, trees, tree_weights, bias, n_features_in):
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        self.roots = offsets.astype(np.int32)
+        self.left = np.concatenate([
+            np.where(tree.children_left >= 0, tree.children_left + offset, -1)
+            for tree, offset in zip(trees, offsets)
+        ]).astype(np.int32)
+        self.right = np.concatenate([
+            np.where(tree.children_right >= 0, tree.children_right + offset, -1)
+            for tree, offset in zip(trees, offsets)
+        ]).astype(np.int32)
+        self.feature = np.concatenate([
+            np.where(tree.children_left >= 0, tree.feature, -1) for tree in trees
+        ]).astype(np.int32)
+        self.threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float32)
+        self.value = np.concatenate([tree.value[:, :, 0] for tree in trees]).astype(np.float32)
+        # Training samples per node, kept for path-dependent TreeSHAP explanations
+        self.cover = np.concatenate([tree.weighted_n_node_samples for tree in trees]).astype(np.float32)
+        self.tree_weights = np.asarray(tree_weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32).reshape(-1)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_features_in_ = n_features_in
+        self.n_outputs_ = self.value.shape[1]
+
+    def predict(self, X, chunk_size=4096):
+        X = np.asarray(X, dtype=np.float32)
+        predictions = [self._predict_chunk(X[start:start + chunk_size]) for start in range(0, len(X), chunk_size)]
+        predictions = np.concatenate(predictions) if predictions else np.empty((0, self.n_outputs_))
+        return predictions[:, 0] if self.n_outputs_ == 1 else predictions
+
+    def _predict_chunk(self, X):
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            is_split = feature >= 0
+            if not is_split.any():
+                break
+            go_left = X[rows, np.maximum(feature, 0)] <= self.threshold[node]
+            node = np.where(is_split, np.where(go_left, self.left[node], self.right[node]), node)
+        # (rows, trees, outputs) weighted over trees
+        # Accumulate in float64 so callers get plain Python-convertible floats
+        return self.bias.astype(np.float64) + np.tensordot(
+            self.value[node].astype(np.float64), self.tree_weights.astype(np.float64), axes=([1], [0])
+        )
+
+
+class ModelCompactor:
+    def __init__(self):
+        self.model_compactor_config = ModelCompactorConfig()
+
+    @staticmethod
+    def _tree_predictions(trees, X):
+        X = np.asarray(X, dtype=np.float32)
+        return np.stack([tree.predict(X) for tree in trees], axis=1)
+
+    def _select_forest_trees(self, forest, X_val, y_val, target_r2):
+        """Greedy forward selection of the fewest trees whose mean stays within target_r2."""
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        if forest.n_outputs_ != 1 or not self.model_compactor_config.prune_trees:
+            return list(range(len(trees)))
+        per_tree = self._tree_predictions(forest.estimators_, X_val)
+        selected, running_sum = [], np.zeros(len(y_val))
+        remaining = np.ones(per_tree.shape[1], dtype=bool)
+        while remaining.any():
+            k = len(selected) + 1
+            candidate_r2 = np.full(per_tree.shape[1], -np.inf)
+            means = (running_sum[:, None] + per_tree[:, remaining]) / k
+            ss_res = ((y_val[:, None] - means) ** 2).sum(axis=0)
+            candidate_r2[remaining] = 1 - ss_res / ((y_val - y_val.mean()) ** 2).sum()
+            best = int(np.argmax(candidate_r2))
+            selected.append(best)
+            running_sum += per_tree[:, best]
+            remaining[best] = False
+            if candidate_r2[best] >= target_r2:
+                break
+        return sorted(selected)
+
+    def _select_boosting_stages(self, gbr, X_val, y_val, target_r2):
+        """Smallest number of boosting stages that stays within target_r2."""
+        if not self.model_compactor_config.prune_trees:
+            return gbr.n_estimators_
+        for n_stages, staged in enumerate(gbr.staged_predict(X_val), 1):
+            if r2_score(y_val, staged) >= target_r2:
+                return n_stages
+        return gbr.n_estimators_
+
+    def compact_model(self, model, X_val, y_val, target_r2):
+        """Return a compacted equivalent of model, or the model with training-only attributes dropped."""
+        if isinstance(model, DecisionTreeRegressor):
+            return CompactTreeEnsemble([model.tree_], [1.0], np.zeros(model.n_outputs_), model.n_features_in_)
+
+        if isinstance(model, RandomForestRegressor):
+            keep = self._select_forest_trees(model, X_val, y_val, target_r2)
+            trees = [model.estimators_[i].tree_ for i in keep]
+            return CompactTreeEnsemble(trees, [1.0 / len(trees)] * len(trees), np.zeros(model.n_outputs_), model.n_features_in_)
+
+        if isinstance(model, GradientBoostingRegressor) and (model.init == "zero" or hasattr(model.init_, "constant_")):
+            n_stages = self._select_boosting_stages(model, X_val, y_val, target_r2)
+            bias = 0.0 if model.init == "zero" else np.ravel(model.init_.constant_)
+            trees = [stage[0].tree_ for stage in model.estimators_[:n_stages]]
+            return CompactTreeEnsemble(trees, [model.learning_rate] * n_stages, bias, model.n_features_in_)
+
+        for attribute in TRAINING_ONLY_ATTRIBUTES:
+            if attribute in model.__dict__:
+                delattr(model, attribute)
+        return model
+
+    def initiate_model_compaction(self, model_path, X_val, y_val, X_test, y_test):
+        """
+        Compact the trained model artifact and write it compressed with joblib.
+        Trees and boosting stages are chosen on X_val/y_val, rows held out from
+        training (DataTransformation.split_validation); the compaction is refused
+        (original kept, accepted=False) if test R² falls more than max_r2_drop
+        below the original model.
+        """
+        logging.info("Model compaction started")
+        try:
+            original_size = os.path.getsize(model_path)
+            start = time.perf_counter()
+            model_artifacts = load_object(model_path)
+            original_load_seconds = time.perf_counter() - start
+
+            config = self.model_compactor_config
+            model = model_artifacts['model']
+            val_target_r2 = r2_score(y_val, model.predict(X_val)) - config.max_r2_drop
+
+            original_r2 = r2_score(y_test, model.predict(X_test))
+            target_r2 = original_r2 - config.max_r2_drop
+
+            compact = self.compact_model(model, X_val, y_val, val_target_r2)
+            compact_r2 = r2_score(y_test, compact.predict(X_test))
+
+            report = {
+                "model_type": type(model).__name__,
+                "compact_type": type(compact).__name__,
+                "original_size_bytes": original_size,
+                "original_load_seconds": original_load_seconds,
+                "original_r2": original_r2,
+                "compact_r2": compact_r2,
+                "accepted": compact_r2 >= target_r2,
+            }
+
+            if not report["accepted"]:
+                logging.warning(
+                    f"Compaction refused: R² {compact_r2:.4f} below allowed {target_r2:.4f} "
+                    f"(original {original_r2:.4f})"
+                )
+                # Never leave an artifact from a previous model behind for serving to pick up
+                if os.path.exists(self.model_compactor_config.compact_model_file_path):
+                    os.remove(self.model_compactor_config.compact_model_file_path)
+                return report
+
+            compact_path = self.model_compactor_config.compact_model_file_path
+            os.makedirs(os.path.dirname(compact_path), exist_ok=True)
+            joblib.dump({**model_artifacts, 'model': compact}, compact_path, compress=self.model_compactor_config.compress)
+
+            start = time.perf_counter()
+            load_object(compact_path)
+            report["compact_load_seconds"] = time.perf_counter() - start
+            report["compact_size_bytes"] = os.path.getsize(compact_path)
+            report["compact_model_file_path"] = compact_path
+
+            logging.info(f"Model compaction report: {report}")
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
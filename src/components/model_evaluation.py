@@ -0,0 +1,198 @@
+import hashlib
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object
+
+SUBGROUP_COLUMNS = [
+    "gender",
+    "race/ethnicity",
+    "lunch",
+    "test preparation course",
+]
+
+
+@dataclass
+class ModelEvaluationConfig:
+    evaluation_report_dir = os.path.join("artifacts", "evaluation_reports")
+    target_column_name: str = "math score"
+    n_bootstrap: int = 5000
+    confidence_level: float = 0.95
+    random_state: int = 42
+    # Most resamples per block; the block also shrinks to fit bootstrap_memory_budget_bytes
+    bootstrap_block_size: int = 1000
+    # Working memory of one block of (block, n_test) matrices
+    bootstrap_memory_budget_bytes: int = 256 * 1024 ** 2
+    subgroup_columns: list = field(default_factory=lambda: list(SUBGROUP_COLUMNS))
+
+
+# Bytes per (resample, row) element of a block: the int64 index, resampled y_true and
+# y_pred, resample / group ids and the bincount temporaries, about a dozen 8-byte arrays
+BOOTSTRAP_BYTES_PER_ELEMENT = 96
+
+
+def _grouped_r2_mae(y_true, y_pred, codes, n_groups):
+    """
+    R² and MAE for every group id in codes with bincount reductions. codes may be
+    a flattened (resample, group) id, in which case n_groups is their total count.
+    """
+    error = y_true - y_pred
+    count = np.bincount(codes, minlength=n_groups)
+    sum_y = np.bincount(codes, weights=y_true, minlength=n_groups)
+    sum_y2 = np.bincount(codes, weights=y_true ** 2, minlength=n_groups)
+    ss_res = np.bincount(codes, weights=error ** 2, minlength=n_groups)
+    sum_abs = np.bincount(codes, weights=np.abs(error), minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ss_tot = sum_y2 - sum_y ** 2 / count
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+        mae = sum_abs / count
+    return r2, mae, count
+
+
+class ModelEvaluation:
+    def __init__(self):
+        self.model_evaluation_config = ModelEvaluationConfig()
+
+    def _bootstrap(self, y_true, y_pred, group_codes):
+        """
+        Bootstrap R²/MAE overall and per subgroup. Each block draws an index matrix
+        of resamples and reduces every resample (and every resample x group) at once;
+        blocks are sized to the memory budget, so large test sets use smaller blocks.
+        """
+        config = self.model_evaluation_config
+        rng = np.random.default_rng(config.random_state)
+        n = len(y_true)
+        overall_r2, overall_mae = [], []
+        group_r2 = {column: [] for column in group_codes}
+        group_mae = {column: [] for column in group_codes}
+
+        block_size = max(1, min(
+            config.bootstrap_block_size,
+            config.bootstrap_memory_budget_bytes // (n * BOOTSTRAP_BYTES_PER_ELEMENT),
+        ))
+        for start in range(0, config.n_bootstrap, block_size):
+            n_block = min(block_size, config.n_bootstrap - start)
+            idx = rng.integers(0, n, size=(n_block, n))
+            yt, yp = y_true[idx], y_pred[idx]
+            resample_ids = np.repeat(np.arange(n_block), n)
+
+            r2, mae, _ = _grouped_r2_mae(yt.ravel(), yp.ravel(), resample_ids, n_block)
+            overall_r2.append(r2)
+            overall_mae.append(mae)
+
+            for column, (codes, categories) in group_codes.items():
+                n_groups = len(categories)
+                flat_ids = resample_ids * n_groups + codes[idx].ravel()
+                r2, mae, _ = _grouped_r2_mae(yt.ravel(), yp.ravel(), flat_ids, n_block * n_groups)
+                group_r2[column].append(r2.reshape(n_block, n_groups))
+                group_mae[column].append(mae.reshape(n_block, n_groups))
+
+        return (
+            np.concatenate(overall_r2),
+            np.concatenate(overall_mae),
+            {column: np.vstack(values) for column, values in group_r2.items()},
+            {column: np.vstack(values) for column, values in group_mae.items()},
+        )
+
+    def _interval(self, samples, axis=0):
+        alpha = (1 - self.model_evaluation_config.confidence_level) / 2
+        low, high = np.nanquantile(samples, [alpha, 1 - alpha], axis=axis)
+        return low, high
+
+    def _next_report_path(self):
+        report_dir = self.model_evaluation_config.evaluation_report_dir
+        os.makedirs(report_dir, exist_ok=True)
+        versions = [
+            int(match.group(1))
+            for match in (re.match(r"evaluation_report_v(\d+)\.pkl$", name) for name in os.listdir(report_dir))
+            if match
+        ]
+        version = max(versions, default=0) + 1
+        return version, os.path.join(report_dir, f"evaluation_report_v{version}.pkl")
+
+    def initiate_model_evaluation(self, model_path, preprocessor_path, test_path):
+        """
+        Predict the test set once and build a report with bootstrap confidence
+        intervals and per-subgroup metrics, saved as the next evaluation_report_vN.pkl.
+        """
+        logging.info("Model evaluation started")
+        try:
+            config = self.model_evaluation_config
+            test_df = pd.read_csv(test_path)
+            model = load_object(model_path)['model']
+            preprocessor = load_object(preprocessor_path)
+
+            y_true = test_df[config.target_column_name].to_numpy(dtype=float)
+            y_pred = np.asarray(
+                model.predict(preprocessor.transform(test_df.drop(columns=[config.target_column_name]))),
+                dtype=float,
+            )
+
+            group_codes = {}
+            for column in config.subgroup_columns:
+                codes, categories = pd.factorize(test_df[column], sort=True)
+                group_codes[column] = (codes, list(categories))
+
+            r2, mae, _ = _grouped_r2_mae(y_true, y_pred, np.zeros(len(y_true), dtype=int), 1)
+            boot_r2, boot_mae, boot_group_r2, boot_group_mae = self._bootstrap(y_true, y_pred, group_codes)
+            r2_low, r2_high = self._interval(boot_r2)
+            mae_low, mae_high = self._interval(boot_mae)
+
+            subgroups = {}
+            for column, (codes, categories) in group_codes.items():
+                group_r2, group_mae, count = _grouped_r2_mae(y_true, y_pred, codes, len(categories))
+                g_r2_low, g_r2_high = self._interval(boot_group_r2[column])
+                g_mae_low, g_mae_high = self._interval(boot_group_mae[column])
+                subgroups[column] = pd.DataFrame({
+                    "group": categories,
+                    "count": count,
+                    "r2": group_r2,
+                    "r2_ci_low": g_r2_low,
+                    "r2_ci_high": g_r2_high,
+                    "mae": group_mae,
+                    "mae_ci_low": g_mae_low,
+                    "mae_ci_high": g_mae_high,
+                })
+
+            with open(model_path, "rb") as model_file:
+                model_sha256 = hashlib.sha256(model_file.read()).hexdigest()
+
+            version, report_path = self._next_report_path()
+            report = {
+                "version": version,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "model_path": model_path,
+                "model_sha256": model_sha256,
+                "model_type": type(model).__name__,
+                "n_test": len(y_true),
+                "n_bootstrap": config.n_bootstrap,
+                "confidence_level": config.confidence_level,
+                "overall": {
+                    "r2": float(r2[0]),
+                    "r2_ci": (float(r2_low), float(r2_high)),
+                    "mae": float(mae[0]),
+                    "mae_ci": (float(mae_low), float(mae_high)),
+                },
+                "subgroups": subgroups,
+            }
+            save_object(report_path, report)
+
+            logging.info(
+                f"Evaluation report v{version}: R² {r2[0]:.4f} [{r2_low:.4f}, {r2_high:.4f}], "
+                f"MAE {mae[0]:.3f} [{mae_low:.3f}, {mae_high:.3f}] saved to {report_path}"
+            )
+            for column, table in subgroups.items():
+                logging.info(f"Subgroup metrics by {column}:\n{table.to_string(index=False)}")
+
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -1,7 +1,9 @@
 import os
 import sys
+import json
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from typing import Optional
 import time
 
 from catboost import CatBoostRegressor
@@ -12,6 +14,7 @@ from sklearn.ensemble import(
 )
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.svm import SVR
 from xgboost import XGBRegressor
 from sklearn.tree import DecisionTreeRegressor
@@ -21,11 +24,38 @@ from scipy.stats import uniform, randint
 from src.logger import logging
 from src.exception import CustomException
 
-from src.utils import save_object, evaluate_model
+from src.utils import save_object, load_object, evaluate_model, MaskedTargetScorer
+from src.training_profiler import TrainingProfiler, TrainingProfilerConfig
+from src.resource_planner import ResourcePlanner, ResourcePlannerConfig
+
+# Estimators that fit several targets jointly without a per-target wrapper
+NATIVE_MULTI_OUTPUT_MODELS = {
+    "LinearRegression",
+    "DecisionTreeRegressor",
+    "RandomForestRegressor",
+    "KNeighborsRegressor",
+    "XGBRegressor",
+    "CatBoostRegressor",
+}
 
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join("artifacts", "model.pkl")
+    multi_target_model_file_path = os.path.join("artifacts", "multi_target_model.pkl")
+    # Per-fit trace (wall/CPU time, peak RSS, threads) exported to training_profiler_config.trace_dir
+    profile_training: bool = False
+    training_profiler_config: TrainingProfilerConfig = field(default_factory=TrainingProfilerConfig)
+    # Split cores between search workers and library threads instead of n_jobs=-1 everywhere
+    plan_cpu_resources: bool = False
+    resource_planner_config: ResourcePlannerConfig = field(default_factory=ResourcePlannerConfig)
+    training_report_file_path = os.path.join("artifacts", "training_report.json")
+    # "max_r2": best test R² only; "budget": best R² within the budgets below;
+    # "pareto": cheapest model on the R²/latency/size Pareto front within r2_tolerance of the best R²
+    selection_policy: str = "max_r2"
+    max_single_row_latency_ms: Optional[float] = None
+    max_batch_latency_ms: Optional[float] = None
+    max_artifact_size_bytes: Optional[int] = None
+    r2_tolerance: float = 0.01
 
 class ModelTrainer:
     def __init__(self):
@@ -50,6 +80,178 @@ class ModelTrainer:
             logging.error(f"Error saving model artifacts: {str(e)}")
             raise CustomException(str(e), error_detail=sys)
         
+    def get_training_profiler(self, run_name):
+        """Profiler writing to its own subdirectory, since a profiler clears its trace dir on start."""
+        if not self.model_trainer_config.profile_training:
+            return None
+        config = self.model_trainer_config.training_profiler_config
+        return TrainingProfiler(replace(config, trace_dir=os.path.join(config.trace_dir, run_name)))
+
+    def get_resource_planner(self):
+        if not self.model_trainer_config.plan_cpu_resources:
+            return None
+        return ResourcePlanner(self.model_trainer_config.resource_planner_config)
+
+    def select_best_model(self, model_report, serving_costs):
+        """Model name chosen by the configured selection policy, and why."""
+        config = self.model_trainer_config
+        best_r2_name = max(model_report, key=model_report.get)
+        if config.selection_policy == "max_r2":
+            return best_r2_name, "highest test R²"
+
+        if config.selection_policy == "budget":
+            budgets = {
+                "single_row_latency_ms": config.max_single_row_latency_ms,
+                "batch_latency_ms": config.max_batch_latency_ms,
+                "artifact_size_bytes": config.max_artifact_size_bytes,
+            }
+            within = [
+                name for name in model_report
+                if all(limit is None or serving_costs[name][key] <= limit for key, limit in budgets.items())
+            ]
+            if not within:
+                logging.warning(f"No model within serving budgets {budgets}, falling back to highest R²")
+                return best_r2_name, "no model within budgets; highest test R²"
+            return max(within, key=model_report.get), f"highest test R² within budgets {budgets}"
+
+        if config.selection_policy == "pareto":
+            def cost(name):
+                return (serving_costs[name]["single_row_latency_ms"], serving_costs[name]["artifact_size_bytes"])
+
+            def dominated(name):
+                return any(
+                    model_report[other] >= model_report[name]
+                    and all(o <= c for o, c in zip(cost(other), cost(name)))
+                    and (model_report[other], cost(other)) != (model_report[name], cost(name))
+                    for other in model_report
+                )
+
+            front = [name for name in model_report if not dominated(name)]
+            floor = model_report[best_r2_name] - config.r2_tolerance
+            candidates = [name for name in front if model_report[name] >= floor]
+            logging.info(f"Pareto front: {front}; within R² tolerance: {candidates}")
+            return min(candidates, key=cost), f"cheapest Pareto-optimal model within {config.r2_tolerance} R² of the best"
+
+        raise ValueError(f"Unknown selection policy: {config.selection_policy}")
+
+    def save_training_report(self, model_report, serving_costs, best_model_name, reason):
+        config = self.model_trainer_config
+        training_report = {
+            "selection_policy": config.selection_policy,
+            "selected_model": best_model_name,
+            "selection_reason": reason,
+            "models": {
+                name: {"test_r2": score, **serving_costs.get(name, {})}
+                for name, score in model_report.items()
+            },
+        }
+        os.makedirs(os.path.dirname(config.training_report_file_path), exist_ok=True)
+        with open(config.training_report_file_path, "w") as report_file:
+            json.dump(training_report, report_file, indent=2)
+        logging.info(f"Training report saved to {config.training_report_file_path}")
+        return training_report
+
+    def get_models_and_params(self):
+        """Candidate models and their hyperparameter grids"""
+        models = {
+            "LinearRegression": LinearRegression(),
+            "DecisionTreeRegressor": DecisionTreeRegressor(),
+            "RandomForestRegressor": RandomForestRegressor(),
+            "GradientBoostingRegressor": GradientBoostingRegressor(),
+            "HistGradientBoostingRegressor": HistGradientBoostingRegressor(),
+            "XGBRegressor": XGBRegressor(),
+            "CatBoostRegressor": CatBoostRegressor(verbose=False),
+            "SVR": SVR(),
+            "KNeighborsRegressor": KNeighborsRegressor()
+        }
+
+        # Optimized parameter grids 
+        param = {
+            "LinearRegression": {},  
+            
+            "DecisionTreeRegressor": {
+                'max_depth': [5, 10, 20, None],  
+                'min_samples_split': [2, 5, 10],  
+                'min_samples_leaf': [1, 2, 4],   
+                'max_features': ['sqrt', None]    
+            },
+            
+            "RandomForestRegressor": {
+                'n_estimators': [100, 200, 300],     
+                'max_depth': [10, 20, None],         
+                'min_samples_split': [2, 5],         
+                'min_samples_leaf': [1, 2],         
+                'max_features': ['sqrt', None],     
+                'bootstrap': [True]                  
+            },
+            
+            "GradientBoostingRegressor": {
+                'n_estimators': [100, 200],          
+                'learning_rate': [0.01, 0.1, 0.2],   
+                'max_depth': [3, 6],                  
+                'min_samples_split': [2, 10],        
+                'subsample': [0.8, 1.0]              
+            },
+            
+            "HistGradientBoostingRegressor": {
+                'learning_rate': [0.01, 0.1, 0.2],   
+                'max_iter': [100, 200],              
+                'max_depth': [3, 6],                 
+                'min_samples_leaf': [1, 5],         
+                'l2_regularization': [0, 0.1]      
+            },
+            
+            "XGBRegressor": {
+                'n_estimators': [100, 200],          
+                'learning_rate': [0.01, 0.1, 0.2],   
+                'max_depth': [3, 6],                  
+                'min_child_weight': [1, 3],          
+                'subsample': [0.8, 1.0],            
+                'colsample_bytree': [0.8, 1.0]      
+            },
+            
+            "CatBoostRegressor": {
+                'iterations': [100, 200],            
+                'learning_rate': [0.01, 0.1, 0.2],   
+                'depth': [4, 6],                     
+                'l2_leaf_reg': [1, 3]               
+            },
+            
+            "SVR": {
+                'C': [0.1, 1, 10],                  
+                'epsilon': [0.01, 0.1],             
+                'kernel': ['rbf', 'linear'],        
+                'gamma': ['scale', 'auto']           
+            },
+            
+            "KNeighborsRegressor": {
+                'n_neighbors': [3, 5, 7, 10],       
+                'weights': ['uniform', 'distance'],
+                'p': [1, 2]
+            }
+        }
+
+        return models, param
+
+    def get_multi_target_models_and_params(self):
+        """
+        Candidates for predicting all SCORE_COLUMNS at once. Models with native
+        multi-output support (shared trees / joint solvers) are used as-is; the rest
+        are wrapped in MultiOutputRegressor with their grids prefixed accordingly.
+        """
+        models, param = self.get_models_and_params()
+        models["XGBRegressor"] = XGBRegressor(tree_method="hist")
+        models["CatBoostRegressor"] = CatBoostRegressor(loss_function="MultiRMSE", verbose=False)
+
+        for model_name in list(models):
+            if model_name in NATIVE_MULTI_OUTPUT_MODELS:
+                continue
+            models[model_name] = MultiOutputRegressor(models[model_name])
+            param[model_name] = {
+                f"estimator__{name}": values for name, values in param[model_name].items()
+            }
+        return models, param
+
     def initiate_model_trainer(self, train_array, test_array):
         logging.info("Model Trainer started")
         try:
@@ -62,83 +264,7 @@ class ModelTrainer:
             )
             logging.info("Training and Testing data split completed")
 
-            models = {
-                "LinearRegression": LinearRegression(),
-                "DecisionTreeRegressor": DecisionTreeRegressor(),
-                "RandomForestRegressor": RandomForestRegressor(),
-                "GradientBoostingRegressor": GradientBoostingRegressor(),
-                "HistGradientBoostingRegressor": HistGradientBoostingRegressor(),
-                "XGBRegressor": XGBRegressor(),
-                "CatBoostRegressor": CatBoostRegressor(verbose=False),
-                "SVR": SVR(),
-                "KNeighborsRegressor": KNeighborsRegressor()
-            }
-
-            # Optimized parameter grids 
-            param = {
-                "LinearRegression": {},  
-                
-                "DecisionTreeRegressor": {
-                    'max_depth': [5, 10, 20, None],  
-                    'min_samples_split': [2, 5, 10],  
-                    'min_samples_leaf': [1, 2, 4],   
-                    'max_features': ['sqrt', None]    
-                },
-                
-                "RandomForestRegressor": {
-                    'n_estimators': [100, 200, 300],     
-                    'max_depth': [10, 20, None],         
-                    'min_samples_split': [2, 5],         
-                    'min_samples_leaf': [1, 2],         
-                    'max_features': ['sqrt', None],     
-                    'bootstrap': [True]                  
-                },
-                
-                "GradientBoostingRegressor": {
-                    'n_estimators': [100, 200],          
-                    'learning_rate': [0.01, 0.1, 0.2],   
-                    'max_depth': [3, 6],                  
-                    'min_samples_split': [2, 10],        
-                    'subsample': [0.8, 1.0]              
-                },
-                
-                "HistGradientBoostingRegressor": {
-                    'learning_rate': [0.01, 0.1, 0.2],   
-                    'max_iter': [100, 200],              
-                    'max_depth': [3, 6],                 
-                    'min_samples_leaf': [1, 5],         
-                    'l2_regularization': [0, 0.1]      
-                },
-                
-                "XGBRegressor": {
-                    'n_estimators': [100, 200],          
-                    'learning_rate': [0.01, 0.1, 0.2],   
-                    'max_depth': [3, 6],                  
-                    'min_child_weight': [1, 3],          
-                    'subsample': [0.8, 1.0],            
-                    'colsample_bytree': [0.8, 1.0]      
-                },
-                
-                "CatBoostRegressor": {
-                    'iterations': [100, 200],            
-                    'learning_rate': [0.01, 0.1, 0.2],   
-                    'depth': [4, 6],                     
-                    'l2_leaf_reg': [1, 3]               
-                },
-                
-                "SVR": {
-                    'C': [0.1, 1, 10],                  
-                    'epsilon': [0.01, 0.1],             
-                    'kernel': ['rbf', 'linear'],        
-                    'gamma': ['scale', 'auto']           
-                },
-                
-                "KNeighborsRegressor": {
-                    'n_neighbors': [3, 5, 7, 10],       
-                    'weights': ['uniform', 'distance'],
-                    'p': [1, 2]
-                }
-            }
+            models, param = self.get_models_and_params()
 
             logging.info("Models initialized with optimized hyperparameter grids")
             logging.info("Starting model training and evaluation with hyperparameter tuning")
@@ -160,13 +286,17 @@ class ModelTrainer:
             # Start timing
             start_time = time.time()
             
+            serving_costs = {}
             model_report: dict = evaluate_model(
                 X_train=X_train, 
                 y_train=y_train, 
                 X_test=X_test, 
                 y_test=y_test, 
                 models=models, 
-                param=param
+                param=param,
+                profiler=self.get_training_profiler("single_target"),
+                serving_costs=serving_costs,
+                resource_planner=self.get_resource_planner()
             )
             
             # End timing
@@ -176,13 +306,13 @@ class ModelTrainer:
             logging.info(f"Hyperparameter tuning completed in {training_time:.2f} seconds")
             logging.info(f"Model evaluation results: {model_report}")
 
-            best_model_score = max(sorted(model_report.values()))
-
-            best_model_name = list(model_report.keys())[list(model_report.values()).index(best_model_score)]
+            best_model_name, selection_reason = self.select_best_model(model_report, serving_costs)
+            best_model_score = model_report[best_model_name]
             
             best_model = models[best_model_name]
+            self.save_training_report(model_report, serving_costs, best_model_name, selection_reason)
             
-            logging.info(f"Best performing model: {best_model_name}")
+            logging.info(f"Best performing model: {best_model_name} ({selection_reason})")
             logging.info(f"Best model score: {best_model_score:.4f}")
             
             # Log all model performances for comparison
@@ -237,4 +367,135 @@ class ModelTrainer:
         except Exception as e:
             logging.error(f"Error in model training: {str(e)}")
             raise CustomException(e, sys)
-        
\ No newline at end of file
+
+    def initiate_multi_target_trainer(self, train_array, test_array, preprocessor_path):
+        """
+        Tune and select one model predicting every column of SCORE_COLUMNS, and save it
+        together with its preprocessor as a single artifact. Models are scored only
+        on the scores hidden from their input (MaskedTargetScorer).
+        """
+        from src.components.data_transformation import CATEGORICAL_COLUMNS, SCORE_COLUMNS, DataTransformation
+        logging.info("Multi-target Model Trainer started")
+        try:
+            n_targets = len(SCORE_COLUMNS)
+            X_train, y_train, X_test, y_test = (
+                train_array[:, :-n_targets],
+                train_array[:, -n_targets:],
+                test_array[:, :-n_targets],
+                test_array[:, -n_targets:]
+            )
+
+            models, param = self.get_multi_target_models_and_params()
+            preprocessor = load_object(preprocessor_path)
+            scorer = MaskedTargetScorer(DataTransformation.missing_indicator_columns(preprocessor))
+
+            model_report: dict = evaluate_model(
+                X_train=X_train,
+                y_train=y_train,
+                X_test=X_test,
+                y_test=y_test,
+                models=models,
+                param=param,
+                profiler=self.get_training_profiler("multi_target"),
+                resource_planner=self.get_resource_planner(),
+                scoring=scorer,
+                # Masked copies of one student must not straddle CV folds
+                groups=DataTransformation.masked_row_groups(len(X_train))
+            )
+
+            best_model_name = max(model_report, key=model_report.get)
+            best_model = models[best_model_name]
+            logging.info(f"Best multi-target model: {best_model_name} ({model_report[best_model_name]:.4f})")
+
+            per_target_r2 = dict(zip(
+                SCORE_COLUMNS,
+                scorer.per_target(y_test, best_model.predict(X_test), scorer.target_mask(X_test)),
+            ))
+            logging.info(f"Multi-target R² per subject (hidden scores only): {per_target_r2}")
+
+            save_object(
+                file_path=self.model_trainer_config.multi_target_model_file_path,
+                obj={
+                    'model': best_model,
+                    'preprocessor': preprocessor,
+                    'feature_names': CATEGORICAL_COLUMNS + SCORE_COLUMNS,
+                    'categorical_features': CATEGORICAL_COLUMNS,
+                    'target_columns': SCORE_COLUMNS,
+                }
+            )
+            logging.info("Multi-target model artifact saved successfully")
+
+            return per_target_r2
+
+        except Exception as e:
+            logging.error(f"Error in multi-target model training: {str(e)}")
+            raise CustomException(e, sys)
+
+
+def benchmark_multi_target(train_path, test_path, n_predict_rows=10000):
+    """
+    Compare one multi-target pipeline against three single-target pipelines:
+    end-to-end training time and the time to predict all subjects for a batch.
+    """
+    import tempfile
+    import pandas as pd
+    from src.components.data_transformation import DataTransformation, SCORE_COLUMNS
+
+    try:
+        results = {}
+        with tempfile.TemporaryDirectory(prefix="multi_target_bench_") as tmp_dir:
+            transformation = DataTransformation()
+            transformation.data_transformation_config.preprocessor_obj_file_path = os.path.join(tmp_dir, "preprocessor.pkl")
+            transformation.data_transformation_config.multi_target_preprocessor_obj_file_path = os.path.join(tmp_dir, "mt_preprocessor.pkl")
+            trainer = ModelTrainer()
+            trainer.model_trainer_config.trained_model_file_path = os.path.join(tmp_dir, "model.pkl")
+            trainer.model_trainer_config.multi_target_model_file_path = os.path.join(tmp_dir, "mt_model.pkl")
+            # Nothing under artifacts/ may change: the served model's report and traces stay as they are
+            trainer.model_trainer_config.training_report_file_path = os.path.join(tmp_dir, "training_report.json")
+            trainer.model_trainer_config.training_profiler_config = replace(
+                trainer.model_trainer_config.training_profiler_config, trace_dir=os.path.join(tmp_dir, "training_trace")
+            )
+
+            start = time.perf_counter()
+            train_arr, test_arr, preprocessor_path = transformation.initiate_multi_target_transformation(train_path, test_path)
+            trainer.initiate_multi_target_trainer(train_arr, test_arr, preprocessor_path)
+            results["multi_target_train_seconds"] = time.perf_counter() - start
+            multi_artifact = load_object(trainer.model_trainer_config.multi_target_model_file_path)
+
+            single_artifacts = {}
+            start = time.perf_counter()
+            for target in SCORE_COLUMNS:
+                train_arr, test_arr, preprocessor_path = transformation.initiate_data_transformation(train_path, test_path, target)
+                trainer.initiate_model_trainer(train_arr, test_arr)
+                single_artifacts[target] = (
+                    load_object(preprocessor_path),
+                    load_object(trainer.model_trainer_config.trained_model_file_path)['model'],
+                )
+            results["separate_pipelines_train_seconds"] = time.perf_counter() - start
+
+        test_df = pd.read_csv(test_path)
+        batch = test_df.sample(n=n_predict_rows, replace=True, random_state=42).reset_index(drop=True)
+
+        start = time.perf_counter()
+        multi_input = batch.copy()
+        multi_input[SCORE_COLUMNS] = np.nan
+        multi_artifact['model'].predict(multi_artifact['preprocessor'].transform(multi_input))
+        results["multi_target_predict_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for target, (preprocessor, model) in single_artifacts.items():
+            model.predict(preprocessor.transform(batch.drop(columns=[target])))
+        results["separate_pipelines_predict_seconds"] = time.perf_counter() - start
+
+        logging.info(f"Multi-target benchmark: {results}")
+        return results
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    print(benchmark_multi_target(
+        os.path.join("artifacts", "train.csv"),
+        os.path.join("artifacts", "test.csv")
+    ))
@@ -62,6 +62,19 @@ class RecommendationEngine:
             })
         return recommendations
 
+    @staticmethod
+    def rank_by_impact(recommendations, impacts):
+        """
+        Attach the predicted math score change of each category's what-if scenario
+        and order by it; categories without a scenario follow, in their original order.
+        """
+        for recommendation in recommendations:
+            recommendation['predicted_impact'] = impacts.get(recommendation['category'])
+        return sorted(
+            recommendations,
+            key=lambda r: (r['predicted_impact'] is None, -(r['predicted_impact'] or 0)),
+        )
+
     @staticmethod
     def generate_insights(student_data, predicted_math_score):
         insights = []
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from src.logger import logging
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    result REAL NOT NULL,
+    input_json TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_session ON predictions (session_id, id);
+CREATE TABLE IF NOT EXISTS chat_turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_turns_session ON chat_turns (session_id, id);
+"""
+
+
+@dataclass
+class SessionStoreConfig:
+    db_file_path: str = os.path.join("artifacts", "sessions.db")
+    # Context windows: reads never return more than this, whatever the session age
+    max_predictions: int = 20
+    max_chat_turns: int = 20
+
+
+class SessionStore:
+    """
+    Embedded SQLite store of per-session predictions and chat turns.
+
+    One connection per thread (FastAPI runs sync endpoints in a threadpool), WAL
+    journal so readers do not block the writer. Every read is an index range scan
+    on (session_id, id) limited to the configured context window.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or SessionStoreConfig()
+        os.makedirs(os.path.dirname(self.config.db_file_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        logging.info(f"Session store ready at {self.config.db_file_path}")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.config.db_file_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def validate_session_id(session_id):
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError("Invalid session id")
+        return session_id
+
+    def _ensure_session(self, conn, session_id):
+        conn.execute(
+            "INSERT OR IGNORE INTO sessions (id, created_at) VALUES (?, ?)",
+            (self.validate_session_id(session_id), time.time()),
+        )
+
+    def add_prediction(self, session_id, result, input_data=None):
+        """Store a prediction and return its row id."""
+        with self._connection() as conn:
+            self._ensure_session(conn, session_id)
+            cursor = conn.execute(
+                "INSERT INTO predictions (session_id, result, input_json, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, float(result), json.dumps(input_data) if input_data else None, time.time()),
+            )
+            return cursor.lastrowid
+
+    def add_chat_turns(self, session_id, turns):
+        """turns: iterable of (role, content)"""
+        now = time.time()
+        with self._connection() as conn:
+            self._ensure_session(conn, session_id)
+            conn.executemany(
+                "INSERT INTO chat_turns (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, role, content, now) for role, content in turns],
+            )
+
+    def clear_chat_turns(self, session_id):
+        """Delete the session's chat turns (predictions are kept); returns how many were removed."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM chat_turns WHERE session_id = ?", (self.validate_session_id(session_id),)
+            )
+            return cursor.rowcount
+
+    def recent_predictions(self, session_id, limit=None):
+        """Latest predictions of the session, oldest first, at most max_predictions."""
+        limit = min(limit or self.config.max_predictions, self.config.max_predictions)
+        rows = self._connection().execute(
+            "SELECT result, created_at FROM predictions WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (self.validate_session_id(session_id), limit),
+        ).fetchall()
+        return [{"result": result, "created_at": created_at} for result, created_at in reversed(rows)]
+
+    def recent_chat_turns(self, session_id, limit=None):
+        """Latest chat turns of the session, oldest first, at most max_chat_turns."""
+        limit = min(limit or self.config.max_chat_turns, self.config.max_chat_turns)
+        rows = self._connection().execute(
+            "SELECT role, content, created_at FROM chat_turns WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (self.validate_session_id(session_id), limit),
+        ).fetchall()
+        return [{"role": role, "content": content, "created_at": created_at} for role, content, created_at in reversed(rows)]
+
+    def max_prediction_id(self):
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+
+    def iter_predictions(self, chunk_size=50000, max_id=None):
+        """Stored predictions that kept their input (up to row max_id), as lists of (result, input dict)."""
+        last_id = 0
+        max_id = self.max_prediction_id() if max_id is None else max_id
+        while True:
+            rows = self._connection().execute(
+                "SELECT id, result, input_json FROM predictions "
+                "WHERE id > ? AND id <= ? AND input_json IS NOT NULL ORDER BY id LIMIT ?",
+                (last_id, max_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(result, json.loads(input_json)) for _, result, input_json in rows]
@@ -0,0 +1,188 @@
+"""
+Synthetic student records for scale and load testing.
+
+    python -m src.components.synthetic_data --rows 10000000 --output artifacts/synthetic.parquet
+
+The generator learns the joint distribution of the five categoricals and the
+conditional mean and residual covariance of the three scores from the real CSV,
+then samples rows in vectorized chunks with a fixed seed. Output is streamed
+chunk by chunk to CSV, Parquet or .npy, so memory does not grow with the row count.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.components.data_transformation import CATEGORICAL_COLUMNS, SCORE_COLUMNS
+from src.exception import CustomException
+from src.logger import logging
+
+# API field for each dataset column, for load-test payloads
+COLUMN_TO_FRONTEND_KEYS = {
+    "gender": "gender",
+    "race/ethnicity": "race_ethnicity",
+    "parental level of education": "parental_level_of_education",
+    "lunch": "lunch",
+    "test preparation course": "test_preparation_course",
+    "math score": "math_score",
+    "reading score": "reading_score",
+    "writing score": "writing_score",
+}
+
+
+@dataclass
+class SyntheticDataConfig:
+    source_data_path: str = os.path.join("data", "StudentsPerformance.csv")
+    chunk_size: int = 1_000_000
+    seed: int = 42
+    # Added to every categorical combination count, so unseen combinations can appear
+    smoothing: float = 0.1
+
+
+class SyntheticDataGenerator:
+    def __init__(self, config=None):
+        self.synthetic_data_config = config or SyntheticDataConfig()
+        self.levels = None
+
+    def fit(self, df):
+        """Learn the categorical joint distribution and the score model from df."""
+        try:
+            codes, self.levels = [], {}
+            for column in CATEGORICAL_COLUMNS:
+                column_codes, levels = pd.factorize(df[column], sort=True)
+                codes.append(column_codes)
+                self.levels[column] = np.asarray(levels, dtype=object)
+            self.shape = tuple(len(self.levels[c]) for c in CATEGORICAL_COLUMNS)
+
+            cells = np.ravel_multi_index(codes, self.shape)
+            counts = np.bincount(cells, minlength=int(np.prod(self.shape))).astype(float)
+            counts += self.synthetic_data_config.smoothing
+            self.cell_probabilities = counts / counts.sum()
+
+            # Scores ~ one-hot(categoricals) @ coef + N(0, residual covariance)
+            design = self._design_matrix(np.stack(codes, axis=1))
+            scores = df[SCORE_COLUMNS].to_numpy(dtype=float)
+            self.coef, *_ = np.linalg.lstsq(design, scores, rcond=None)
+            residuals = scores - design @ self.coef
+            self.residual_cholesky = np.linalg.cholesky(np.cov(residuals, rowvar=False))
+
+            logging.info(
+                f"Synthetic data generator fitted on {len(df)} rows, "
+                f"{int((counts > self.synthetic_data_config.smoothing).sum())} observed categorical combinations"
+            )
+            return self
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def from_csv(cls, path=None, config=None):
+        generator = cls(config)
+        return generator.fit(pd.read_csv(path or generator.synthetic_data_config.source_data_path))
+
+    def _design_matrix(self, codes):
+        blocks = [np.ones((len(codes), 1))]
+        for i, n_levels in enumerate(self.shape):
+            # Drop the first level of each categorical to keep the design full rank
+            blocks.append(np.eye(n_levels)[codes[:, i]][:, 1:])
+        return np.hstack(blocks)
+
+    def _sample_codes(self, rng, n_rows):
+        cells = rng.choice(len(self.cell_probabilities), size=n_rows, p=self.cell_probabilities)
+        return np.stack(np.unravel_index(cells, self.shape), axis=1)
+
+    def _sample_scores(self, rng, codes):
+        noise = rng.standard_normal((len(codes), len(SCORE_COLUMNS))) @ self.residual_cholesky.T
+        scores = self._design_matrix(codes) @ self.coef + noise
+        return np.clip(np.rint(scores), 0, 100).astype(np.int16)
+
+    def iter_chunks(self, n_rows, chunk_size=None, seed=None, as_codes=False):
+        """
+        Yield chunks of n_rows synthetic rows in total. With as_codes the chunk is
+        (categorical codes, scores) arrays instead of a DataFrame.
+        """
+        config = self.synthetic_data_config
+        chunk_size = chunk_size or config.chunk_size
+        rng = np.random.default_rng(config.seed if seed is None else seed)
+        for start in range(0, n_rows, chunk_size):
+            n_chunk = min(chunk_size, n_rows - start)
+            codes = self._sample_codes(rng, n_chunk)
+            scores = self._sample_scores(rng, codes)
+            if as_codes:
+                yield codes, scores
+                continue
+            chunk = {column: self.levels[column][codes[:, i]] for i, column in enumerate(CATEGORICAL_COLUMNS)}
+            chunk.update({column: scores[:, i] for i, column in enumerate(SCORE_COLUMNS)})
+            yield pd.DataFrame(chunk)
+
+    def generate(self, n_rows, seed=None):
+        """Small in-memory sample (use iter_chunks/write for large row counts)."""
+        return pd.concat(self.iter_chunks(n_rows, seed=seed), ignore_index=True)
+
+    def iter_api_payloads(self, n_rows, seed=None):
+        """/predict request bodies for API load tests."""
+        for chunk in self.iter_chunks(n_rows, seed=seed):
+            for record in chunk.rename(columns=COLUMN_TO_FRONTEND_KEYS).to_dict(orient="records"):
+                yield {key: (int(value) if isinstance(value, np.integer) else value) for key, value in record.items()}
+
+    def write(self, output_path, n_rows, seed=None):
+        """Stream n_rows to .csv, .parquet or .npy (int16 codes + scores, levels in a .json sidecar)."""
+        try:
+            start = time.perf_counter()
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+            if output_path.endswith(".npy"):
+                columns = CATEGORICAL_COLUMNS + SCORE_COLUMNS
+                out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.int16, shape=(n_rows, len(columns)))
+                row = 0
+                for codes, scores in self.iter_chunks(n_rows, seed=seed, as_codes=True):
+                    out[row:row + len(codes)] = np.hstack([codes, scores])
+                    row += len(codes)
+                out.flush()
+                del out
+                with open(os.path.splitext(output_path)[0] + ".json", "w") as meta_file:
+                    json.dump({"columns": columns, "levels": {c: list(v) for c, v in self.levels.items()}}, meta_file)
+
+            elif output_path.endswith(".parquet"):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                writer = None
+                for chunk in self.iter_chunks(n_rows, seed=seed):
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = writer or pq.ParquetWriter(output_path, table.schema)
+                    writer.write_table(table)
+                if writer is not None:
+                    writer.close()
+
+            else:
+                for i, chunk in enumerate(self.iter_chunks(n_rows, seed=seed)):
+                    chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+            elapsed = time.perf_counter() - start
+            logging.info(f"Wrote {n_rows} synthetic rows to {output_path} in {elapsed:.1f}s ({n_rows / elapsed:.0f} rows/s)")
+            return output_path
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic student records")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output", required=True, help=".csv, .parquet or .npy")
+    parser.add_argument("--source", default=SyntheticDataConfig.source_data_path)
+    parser.add_argument("--seed", type=int, default=SyntheticDataConfig.seed)
+    parser.add_argument("--chunk-size", type=int, default=SyntheticDataConfig.chunk_size)
+    args = parser.parse_args(argv)
+
+    generator = SyntheticDataGenerator.from_csv(
+        args.source, SyntheticDataConfig(source_data_path=args.source, chunk_size=args.chunk_size, seed=args.seed)
+    )
+    print(generator.write(args.output, args.rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+What-if analysis for one student: expand a baseline into scenario variations and
+sweeps, score every scenario in a single batched predictor call and report each
+scenario's change against the baseline.
+"""
+import numpy as np
+import pandas as pd
+
+from src.components.columnar_payload import CATEGORICAL_FIELDS
+
+SCORE_FIELDS = ["reading_score", "writing_score"]
+# Upper bound on scenarios per request, so one call cannot build an unbounded matrix
+MAX_SCENARIOS = 2000
+
+# What-if scenario behind each RecommendationEngine category that has a lever
+IMPACT_SCENARIOS = {
+    "Test Preparation": {"set": {"test_preparation_course": "completed"}},
+    "Reading": {"add": {"reading_score": 10}},
+    "Writing": {"add": {"writing_score": 10}},
+}
+IMPACT_PREFIX = "impact:"
+
+
+def _check_field(field_name):
+    if field_name not in CATEGORICAL_FIELDS and field_name not in SCORE_FIELDS:
+        raise ValueError(f"Unknown what-if field: {field_name}")
+
+
+def expand_scenarios(base: dict, variations=None, sweeps=None, category_levels=None):
+    """
+    Expand one base student into a scenario matrix. Row 0 is the baseline.
+
+    variations: [{"name": ..., "set": {field: value}, "add": {score_field: delta}}]
+    sweeps:     [{"field": f, "values": [...]}] or [{"field": score_f, "start", "stop", "step"}];
+                a categorical sweep without values covers every known category.
+    category_levels: {model categorical column: allowed values}, as from predictor.category_levels()
+    """
+    category_levels = category_levels or {}
+    names, overrides = ["baseline"], [{}]
+
+    for i, variation in enumerate(variations or []):
+        changes = dict(variation.get("set") or {})
+        for field_name, delta in (variation.get("add") or {}).items():
+            if field_name not in SCORE_FIELDS:
+                raise ValueError(f"'add' only applies to score fields, got {field_name}")
+            changes[field_name] = float(base.get(field_name, 0)) + float(delta)
+        for field_name in changes:
+            _check_field(field_name)
+        names.append(variation.get("name") or f"variation_{i}")
+        overrides.append(changes)
+
+    for sweep in sweeps or []:
+        field_name = sweep["field"]
+        _check_field(field_name)
+        values = sweep.get("values")
+        if values is None:
+            if field_name in CATEGORICAL_FIELDS:
+                values = category_levels.get(CATEGORICAL_FIELDS[field_name], [])
+            elif sweep.get("start") is None or sweep.get("stop") is None:
+                raise ValueError(f"Score sweep over {field_name} needs values or start and stop")
+            else:
+                start, stop = float(sweep["start"]), float(sweep["stop"])
+                step = 1.0 if sweep.get("step") is None else float(sweep["step"])
+                # Infinity would overflow the count below, NaN slips through the comparisons
+                if not np.isfinite([start, stop, step]).all():
+                    raise ValueError(f"Score sweep over {field_name} needs finite start, stop and step")
+                if step <= 0 or stop < start:
+                    raise ValueError(f"Score sweep over {field_name} needs step > 0 and stop >= start")
+                # Count first, so the scenario limit is checked before anything is allocated
+                n_values = int(np.floor((stop - start) / step + 1e-9)) + 1
+                if len(overrides) - 1 + n_values > MAX_SCENARIOS:
+                    raise ValueError(f"Too many scenarios: sweep over {field_name} adds {n_values}, limit {MAX_SCENARIOS}")
+                values = (start + step * np.arange(n_values)).tolist()
+        if len(overrides) - 1 + len(values) > MAX_SCENARIOS:
+            raise ValueError(f"Too many scenarios: more than {MAX_SCENARIOS}")
+        for value in values:
+            names.append(f"{field_name}={value}")
+            overrides.append({field_name: value})
+
+    if len(overrides) > MAX_SCENARIOS + 1:
+        raise ValueError(f"Too many scenarios: {len(overrides) - 1} > {MAX_SCENARIOS}")
+
+    scenarios = pd.DataFrame([base] * len(overrides))
+    # One column assignment per field instead of per-row updates
+    for field_name in {f for changes in overrides for f in changes}:
+        column = scenarios[field_name].astype(object).to_numpy()
+        for row, changes in enumerate(overrides):
+            if field_name in changes:
+                column[row] = changes[field_name]
+        scenarios[field_name] = column
+
+    for field_name in SCORE_FIELDS:
+        if field_name in scenarios:
+            scenarios[field_name] = np.clip(scenarios[field_name].astype(float), 0, 100)
+    for field_name, column in CATEGORICAL_FIELDS.items():
+        allowed = category_levels.get(column)
+        if allowed is not None:
+            invalid = ~scenarios[field_name].isin(allowed)
+            if invalid.any():
+                raise ValueError(f"Unknown {field_name}: {scenarios.loc[invalid, field_name].iloc[0]}")
+
+    return names, overrides, scenarios
+
+
+def evaluate_scenarios(predictor, base: dict, variations=None, sweeps=None, category_levels=None):
+    """Score the baseline and every scenario in one vectorized call and return deltas."""
+    names, overrides, scenarios = expand_scenarios(base, variations, sweeps, category_levels)
+    predictions = predictor.predict_batch(scenarios)
+    baseline = float(predictions[0])
+    return {
+        "baseline": baseline,
+        "scenarios": [
+            {
+                "name": name,
+                "changes": changes,
+                "prediction": float(prediction),
+                "delta": float(prediction) - baseline,
+            }
+            for name, changes, prediction in zip(names[1:], overrides[1:], predictions[1:])
+        ],
+    }
+
+
+def impact_variations():
+    """Variations for the recommendation levers, to score in the same batch as the request's."""
+    return [{"name": IMPACT_PREFIX + category, **scenario} for category, scenario in IMPACT_SCENARIOS.items()]
+
+
+def split_impacts(result):
+    """Separate impact_variations() scenarios from a result into {category: predicted delta}."""
+    impacts, scenarios = {}, []
+    for scenario in result["scenarios"]:
+        if scenario["name"].startswith(IMPACT_PREFIX):
+            impacts[scenario["name"][len(IMPACT_PREFIX):]] = scenario["delta"]
+        else:
+            scenarios.append(scenario)
+    return {**result, "scenarios": scenarios}, impacts
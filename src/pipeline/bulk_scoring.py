@@ -0,0 +1,191 @@
+"""
+Offline bulk scoring of student records.
+
+    python -m src.pipeline.bulk_scoring data/students.csv artifacts/scored.csv --workers 8
+
+Input (CSV or Parquet) is read in chunks, chunks are scored by a pool of worker
+processes that each load the model artifacts once, and predictions are appended
+to the output CSV in input order. Only a bounded window of chunks is in flight,
+and a checkpoint after every written chunk lets an interrupted run resume.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+
+PREDICTION_COLUMN = "predicted math score"
+
+
+@dataclass
+class BulkScoringConfig:
+    model_path: str = os.path.join("artifacts", "model.pkl")
+    chunk_size: int = 50000
+    workers: int = os.cpu_count() or 1
+    # Chunks queued or running at once, per worker
+    max_in_flight_per_worker: int = 2
+    # Add scored rows to the "bulk" cohort analytics aggregates
+    update_cohort_analytics: bool = True
+
+
+_worker_predictor = None
+
+
+def _init_worker(model_path):
+    global _worker_predictor
+    from prediction_service import StudentPerformancePredictor
+    _worker_predictor = StudentPerformancePredictor(model_path)
+
+
+def _score_chunk(chunk):
+    return _worker_predictor.predict_batch(chunk)
+
+
+def iter_input_chunks(input_path, chunk_size, skip_rows=0):
+    """Yield DataFrame chunks of the input file, starting after skip_rows records."""
+    if input_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.to_pandas().iloc[skip_rows:]
+            skip_rows = 0
+    else:
+        skip = range(1, skip_rows + 1) if skip_rows else None
+        yield from pd.read_csv(input_path, chunksize=chunk_size, skiprows=skip)
+
+
+class BulkScorer:
+    def __init__(self, config=None):
+        self.bulk_scoring_config = config or BulkScoringConfig()
+
+    @staticmethod
+    def _checkpoint_path(output_path):
+        return output_path + ".checkpoint.json"
+
+    def _load_checkpoint(self, output_path, input_path):
+        checkpoint_path = self._checkpoint_path(output_path)
+        if not os.path.exists(checkpoint_path) or not os.path.exists(output_path):
+            return {"input_path": input_path, "rows_done": 0, "output_bytes": 0}
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get("input_path") != input_path:
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('input_path')}")
+        return checkpoint
+
+    def _save_checkpoint(self, output_path, checkpoint):
+        checkpoint_path = self._checkpoint_path(output_path)
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_path, checkpoint_path)
+
+    def score_file(self, input_path, output_path, resume=True):
+        """Score input_path into output_path and return a throughput report."""
+        try:
+            config = self.bulk_scoring_config
+            checkpoint = self._load_checkpoint(output_path, input_path) if resume else {
+                "input_path": input_path, "rows_done": 0, "output_bytes": 0
+            }
+            if checkpoint["rows_done"]:
+                logging.info(f"Resuming bulk scoring after {checkpoint['rows_done']} rows")
+
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+            rows_scored = 0
+            start = time.perf_counter()
+            max_in_flight = config.workers * config.max_in_flight_per_worker
+            self.cohort_analytics = None
+            if config.update_cohort_analytics:
+                from src.components.cohort_analytics import CohortAnalytics, category_levels_from_preprocessor
+                self.cohort_analytics = CohortAnalytics(category_levels_from_preprocessor(), owned_sources=())
+                # A fresh run replaces this output's rows, a resumed one keeps counting
+                self.cohort_analytics.own_output(output_path, reset=checkpoint["rows_done"] == 0)
+            chunks = iter_input_chunks(input_path, config.chunk_size, checkpoint["rows_done"])
+
+            # Opened by the with statement so a failure anywhere above or below closes it
+            with open(output_path, "r+b" if checkpoint["output_bytes"] else "wb") as output_file, ProcessPoolExecutor(
+                max_workers=config.workers,
+                initializer=_init_worker,
+                initargs=(config.model_path,),
+            ) as pool:
+                # Drop anything written after the last checkpoint
+                output_file.truncate(checkpoint["output_bytes"])
+                output_file.seek(checkpoint["output_bytes"])
+                in_flight = deque()
+                for chunk in chunks:
+                    in_flight.append((chunk, pool.submit(_score_chunk, chunk)))
+                    if len(in_flight) >= max_in_flight:
+                        rows_scored += self._write_next(in_flight, output_file, output_path, checkpoint)
+                while in_flight:
+                    rows_scored += self._write_next(in_flight, output_file, output_path, checkpoint)
+
+            elapsed = time.perf_counter() - start
+            rows_per_second = rows_scored / elapsed if elapsed > 0 else 0.0
+            report = {
+                "rows_scored": rows_scored,
+                "total_rows_done": checkpoint["rows_done"],
+                "seconds": elapsed,
+                "workers": config.workers,
+                "rows_per_second": rows_per_second,
+                "rows_per_second_per_core": rows_per_second / config.workers,
+            }
+            # Run finished, a later run on the same output starts over
+            if os.path.exists(self._checkpoint_path(output_path)):
+                os.remove(self._checkpoint_path(output_path))
+            logging.info(f"Bulk scoring completed: {report}")
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _write_next(self, in_flight, output_file, output_path, checkpoint):
+        """Wait for the oldest chunk, append it to the output and checkpoint."""
+        chunk, future = in_flight.popleft()
+        predictions = future.result()
+        scored = chunk.assign(**{PREDICTION_COLUMN: predictions})
+        data = scored.to_csv(index=False, header=checkpoint["output_bytes"] == 0).encode()
+        output_file.write(data)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        if self.cohort_analytics is not None:
+            # Saved before the checkpoint: a crash in between may count this chunk twice on resume, never drop it
+            self.cohort_analytics.update(chunk, predictions, source="bulk", output_path=output_path)
+            self.cohort_analytics.save()
+        checkpoint["rows_done"] += len(chunk)
+        checkpoint["output_bytes"] += len(data)
+        self._save_checkpoint(output_path, checkpoint)
+        return len(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score student records with the trained model")
+    parser.add_argument("input_path", help="CSV or .parquet file of student records")
+    parser.add_argument("output_path", help="CSV file the scored records are written to")
+    parser.add_argument("--model-path", default=BulkScoringConfig.model_path)
+    parser.add_argument("--chunk-size", type=int, default=BulkScoringConfig.chunk_size)
+    parser.add_argument("--workers", type=int, default=BulkScoringConfig.workers)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    scorer = BulkScorer(BulkScoringConfig(
+        model_path=args.model_path,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+    ))
+    report = scorer.score_file(args.input_path, args.output_path, resume=not args.no_resume)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
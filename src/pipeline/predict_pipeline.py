@@ -14,27 +14,14 @@ class StudentPerformancePredictor:
         self.feature_names = []
         self.is_trained = False
     
-    def prepare_data(self, data_path=None):
+    def prepare_data(self, data_path=None, n_samples=1000):
         """Prepare sample data for training (replace with actual dataset)"""
         if data_path and os.path.exists(data_path):
             df = pd.read_csv(data_path)
         else:
-            # Generate sample data for demonstration
-            np.random.seed(42)
-            n_samples = 1000
-            df = pd.DataFrame({
-                'gender': np.random.choice(['male', 'female'], n_samples),
-                'race/ethnicity': np.random.choice(['group A', 'group B', 'group C', 'group D', 'group E'], n_samples),
-                'parental level of education': np.random.choice([
-                    'some high school', 'high school', 'some college', 
-                    'associate\'s degree', 'bachelor\'s degree', 'master\'s degree'
-                ], n_samples),
-                'lunch': np.random.choice(['free/reduced', 'standard'], n_samples),
-                'test preparation course': np.random.choice(['none', 'completed'], n_samples),
-                'math score': np.random.randint(0, 101, n_samples),
-                'reading score': np.random.randint(0, 101, n_samples),
-                'writing score': np.random.randint(0, 101, n_samples)
-            })
+            # Synthetic students following the real data's categorical mix and score correlations
+            from src.components.synthetic_data import SyntheticDataGenerator
+            df = SyntheticDataGenerator.from_csv().generate(n_samples, seed=42)
         return df
 
     def train_model(self, df):
@@ -0,0 +1,366 @@
+"""
+Training pipeline as a DAG of cached stages.
+
+    python -m src.pipeline.train_pipeline
+    python -m src.pipeline.train_pipeline --from-stage training
+
+Each stage declares the files it reads and writes. Its cache key hashes the
+stage's source code, its parameters and the content of its input files; a stage
+is skipped when the key matches the last successful run and its recorded outputs
+are still on disk unchanged. Because keys hash content rather than timestamps, a
+re-run upstream stage that reproduces identical files does not invalidate its
+dependents. Stages whose dependencies are done run concurrently, except that
+CPU-heavy stages (the model searches) run one at a time, and every run
+appends per-stage timings and cache hits to artifacts/pipeline_runs.jsonl.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+
+COMPONENTS_DIR = os.path.join("src", "components")
+
+
+@dataclass
+class TrainPipelineConfig:
+    cache_file_path = os.path.join("artifacts", "pipeline_cache.json")
+    run_log_file_path = os.path.join("artifacts", "pipeline_runs.jsonl")
+    # Transformed arrays persisted between stages
+    arrays_dir = os.path.join("artifacts", "pipeline")
+    max_workers: int = 4
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], Optional[List[str]]]
+    deps: List[str] = field(default_factory=list)
+    # Files read; a callable is resolved once dependencies have finished
+    inputs: object = field(default_factory=list)
+    # Files written; run() may return the list instead when names are not fixed
+    outputs: List[str] = field(default_factory=list)
+    code: List[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    # Stages that use every core (n_jobs=-1 searches) never run alongside each other
+    cpu_heavy: bool = False
+
+
+def _array_path(name):
+    return os.path.join(TrainPipelineConfig.arrays_dir, f"{name}.npy")
+
+
+def build_stages():
+    """The training DAG: ingestion -> transformation -> training -> reports, plus the multi-target branch."""
+    from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+    from src.components.data_transformation import DataTransformation, DataTransformationConfig
+    from src.components.drift_monitor import DriftMonitorConfig, build_reference_profile
+    from src.components.explanations import ExplanationBuilder, ExplanationConfig
+    from src.components.model_compactor import ModelCompactor, ModelCompactorConfig
+    from src.components.model_evaluation import ModelEvaluation, ModelEvaluationConfig
+    from src.components.model_trainer import ModelTrainer, ModelTrainerConfig
+
+    ingestion_config = DataIngestionConfig()
+    trainer_config = ModelTrainerConfig()
+    train_path, test_path = ingestion_config.train_data_path, ingestion_config.test_data_path
+    preprocessor_path = DataTransformationConfig.preprocessor_obj_file_path
+    multi_target_preprocessor_path = DataTransformationConfig.multi_target_preprocessor_obj_file_path
+    model_path = trainer_config.trained_model_file_path
+    compact_path = ModelCompactorConfig.compact_model_file_path
+
+    def component(name):
+        return os.path.join(COMPONENTS_DIR, name)
+
+    # Both training stages run the same trainer, profiler and planner code
+    trainer_code = [
+        component("model_trainer.py"),
+        os.path.join("src", "utils.py"),
+        os.path.join("src", "training_profiler.py"),
+        os.path.join("src", "resource_planner.py"),
+    ]
+
+    def ingestion():
+        DataIngestion().initiate_data_ingestion()
+
+    def transformation():
+        data_transformation = DataTransformation()
+        train_arr, test_arr, _ = data_transformation.initiate_data_transformation(train_path, test_path)
+        # Carved out before training so compaction tunes on rows the model never saw
+        train_arr, val_arr = data_transformation.split_validation(train_arr)
+        np.save(_array_path("train_arr"), train_arr)
+        np.save(_array_path("val_arr"), val_arr)
+        np.save(_array_path("test_arr"), test_arr)
+
+    def training():
+        r2 = ModelTrainer().initiate_model_trainer(np.load(_array_path("train_arr")), np.load(_array_path("test_arr")))
+        logging.info(f"Pipeline training stage: test R² {r2:.4f}")
+
+    def evaluation():
+        report = ModelEvaluation().initiate_model_evaluation(model_path, preprocessor_path, test_path)
+        return [os.path.join(ModelEvaluationConfig.evaluation_report_dir, f"evaluation_report_v{report['version']}.pkl")]
+
+    def compaction():
+        val_arr, test_arr = np.load(_array_path("val_arr")), np.load(_array_path("test_arr"))
+        ModelCompactor().initiate_model_compaction(
+            model_path, val_arr[:, :-1], val_arr[:, -1], test_arr[:, :-1], test_arr[:, -1]
+        )
+        # The compact artifact is not recorded as an output: incremental refreshes republish
+        # it in place, and a changed hash must not make the next run re-compact over them
+
+    def serving_model_path():
+        return compact_path if os.path.exists(compact_path) else model_path
+
+    def explanations():
+        ExplanationBuilder().initiate_explanation_table(serving_model_path(), preprocessor_path, train_path)
+
+    def drift_reference():
+        build_reference_profile(train_path, model_path, preprocessor_path)
+
+    def multi_target_transformation():
+        train_arr, test_arr, _ = DataTransformation().initiate_multi_target_transformation(train_path, test_path)
+        np.save(_array_path("multi_target_train_arr"), train_arr)
+        np.save(_array_path("multi_target_test_arr"), test_arr)
+
+    def multi_target_training():
+        r2 = ModelTrainer().initiate_multi_target_trainer(
+            np.load(_array_path("multi_target_train_arr")),
+            np.load(_array_path("multi_target_test_arr")),
+            multi_target_preprocessor_path,
+        )
+        logging.info(f"Pipeline multi-target training stage: {r2}")
+
+    return [
+        Stage(
+            "ingestion", ingestion,
+            inputs=[ingestion_config.source_data_path],
+            outputs=[ingestion_config.raw_data_path, train_path, test_path],
+            code=[component("data_ingestion.py")],
+            params=asdict(ingestion_config),
+        ),
+        Stage(
+            "transformation", transformation, deps=["ingestion"],
+            inputs=[train_path, test_path],
+            outputs=[preprocessor_path, _array_path("train_arr"), _array_path("val_arr"), _array_path("test_arr")],
+            code=[component("data_transformation.py")],
+            params=asdict(DataTransformationConfig()),
+        ),
+        Stage(
+            "training", training, deps=["transformation"], cpu_heavy=True,
+            inputs=[_array_path("train_arr"), _array_path("test_arr")],
+            outputs=[model_path, trainer_config.training_report_file_path],
+            code=trainer_code,
+            params=asdict(trainer_config),
+        ),
+        Stage(
+            "evaluation", evaluation, deps=["training"],
+            inputs=[model_path, preprocessor_path, test_path],
+            code=[component("model_evaluation.py")],
+            params=asdict(ModelEvaluationConfig()),
+        ),
+        Stage(
+            "compaction", compaction, deps=["training"],
+            inputs=[model_path, _array_path("val_arr"), _array_path("test_arr")],
+            code=[component("model_compactor.py")],
+            params=asdict(ModelCompactorConfig()),
+        ),
+        Stage(
+            "explanations", explanations, deps=["compaction"],
+            inputs=lambda: [serving_model_path(), preprocessor_path, train_path],
+            outputs=[ExplanationConfig.explanation_table_file_path],
+            code=[component("explanations.py")],
+        ),
+        Stage(
+            "drift_reference", drift_reference, deps=["training"],
+            inputs=[train_path, model_path, preprocessor_path],
+            outputs=[DriftMonitorConfig.reference_profile_file_path],
+            code=[component("drift_monitor.py")],
+        ),
+        Stage(
+            "multi_target_transformation", multi_target_transformation, deps=["ingestion"],
+            inputs=[train_path, test_path],
+            outputs=[
+                multi_target_preprocessor_path,
+                _array_path("multi_target_train_arr"),
+                _array_path("multi_target_test_arr"),
+            ],
+            code=[component("data_transformation.py")],
+        ),
+        Stage(
+            "multi_target_training", multi_target_training, deps=["multi_target_transformation"], cpu_heavy=True,
+            inputs=[_array_path("multi_target_train_arr"), _array_path("multi_target_test_arr")],
+            outputs=[trainer_config.multi_target_model_file_path],
+            code=trainer_code,
+            params=asdict(trainer_config),
+        ),
+    ]
+
+
+class TrainPipeline:
+    def __init__(self, stages=None, config=None):
+        self.train_pipeline_config = config or TrainPipelineConfig()
+        self.stages = {stage.name: stage for stage in (stages or build_stages())}
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    def _load_cache(self):
+        path = self.train_pipeline_config.cache_file_path
+        if os.path.exists(path):
+            with open(path) as cache_file:
+                return json.load(cache_file)
+        return {"stages": {}, "files": {}}
+
+    def _save_cache(self):
+        path = self.train_pipeline_config.cache_file_path
+        with open(path + ".tmp", "w") as cache_file:
+            json.dump(self._cache, cache_file, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def file_hash(self, path):
+        """sha256 of a file, reusing the cached digest while size and mtime are unchanged."""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            cached = self._cache["files"].get(path)
+        if cached and cached["stat"] == key:
+            return cached["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._cache["files"][path] = {"stat": key, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def stage_key(self, stage, inputs):
+        digest = hashlib.sha256(stage.name.encode())
+        for path in stage.code + inputs:
+            digest.update(f"{path}:{self.file_hash(path)}".encode())
+        digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def descendants(self, name):
+        found, frontier = {name}, [name]
+        while frontier:
+            current = frontier.pop()
+            for stage in self.stages.values():
+                if current in stage.deps and stage.name not in found:
+                    found.add(stage.name)
+                    frontier.append(stage.name)
+        return found
+
+    def _is_cached(self, stage, key):
+        with self._lock:
+            entry = self._cache["stages"].get(stage.name)
+        if entry is None or entry["key"] != key:
+            return False
+        return all(self.file_hash(path) == digest for path, digest in entry["outputs"].items())
+
+    def _run_stage(self, stage, forced):
+        start = time.perf_counter()
+        inputs = stage.inputs() if callable(stage.inputs) else list(stage.inputs)
+        key = self.stage_key(stage, inputs)
+        if not forced and self._is_cached(stage, key):
+            logging.info(f"Pipeline stage {stage.name}: cache hit")
+            return {"stage": stage.name, "status": "cached", "seconds": time.perf_counter() - start}
+
+        logging.info(f"Pipeline stage {stage.name}: running")
+        os.makedirs(self.train_pipeline_config.arrays_dir, exist_ok=True)
+        produced = stage.run()
+        outputs = list(stage.outputs) + list(produced or [])
+        recorded = {path: self.file_hash(path) for path in outputs}
+        with self._lock:
+            self._cache["stages"][stage.name] = {
+                "key": key,
+                "outputs": recorded,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save_cache()
+        seconds = time.perf_counter() - start
+        logging.info(f"Pipeline stage {stage.name}: finished in {seconds:.2f}s")
+        return {"stage": stage.name, "status": "ran", "seconds": seconds}
+
+    def run(self, from_stage=None, force=False):
+        """Run the DAG; stages from from_stage onward (and all stages with force) ignore the cache."""
+        try:
+            if from_stage is not None and from_stage not in self.stages:
+                raise ValueError(f"Unknown stage {from_stage}; choose from {list(self.stages)}")
+            forced = set(self.stages) if force else (self.descendants(from_stage) if from_stage else set())
+
+            run_start = time.perf_counter()
+            results, done, running = [], set(), {}
+            with ThreadPoolExecutor(max_workers=self.train_pipeline_config.max_workers) as pool:
+                while len(done) < len(self.stages):
+                    for stage in self.stages.values():
+                        if stage.name in done or stage.name in running.values():
+                            continue
+                        heavy_running = any(self.stages[name].cpu_heavy for name in running.values())
+                        if stage.cpu_heavy and heavy_running:
+                            continue
+                        if all(dep in done for dep in stage.deps):
+                            future = pool.submit(self._run_stage, stage, stage.name in forced)
+                            running[future] = stage.name
+                    if not running:
+                        raise ValueError(f"Stages with unknown dependencies: {set(self.stages) - done}")
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        # Re-raises a stage failure; stages already running finish first
+                        results.append(future.result())
+                        done.add(name)
+
+            run_report = {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "from_stage": from_stage,
+                "force": force,
+                "total_seconds": time.perf_counter() - run_start,
+                "cache_hits": sum(r["status"] == "cached" for r in results),
+                "stages": results,
+            }
+            with open(self.train_pipeline_config.run_log_file_path, "a") as run_log:
+                run_log.write(json.dumps(run_report) + "\n")
+            logging.info(
+                f"Training pipeline finished in {run_report['total_seconds']:.2f}s, "
+                f"{run_report['cache_hits']}/{len(results)} stages cached"
+            )
+            return run_report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the cached training pipeline")
+    parser.add_argument("--from-stage", help="Re-run this stage and everything downstream of it")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache for every stage")
+    parser.add_argument("--max-workers", type=int, default=TrainPipelineConfig.max_workers)
+    parser.add_argument("--list", action="store_true", help="List stages and their dependencies")
+    args = parser.parse_args(argv)
+
+    pipeline = TrainPipeline(config=TrainPipelineConfig(max_workers=args.max_workers))
+    if args.list:
+        for stage in pipeline.stages.values():
+            print(f"{stage.name}: after {', '.join(stage.deps) or '-'}")
+        return
+
+    report = pipeline.run(from_stage=args.from_stage, force=args.force)
+    for result in report["stages"]:
+        print(f"{result['stage']:<30} {result['status']:<7} {result['seconds']:8.2f}s")
+    print(f"total {report['total_seconds']:.2f}s, {report['cache_hits']} cache hits")
+
+
+if __name__ == "__main__":
+    main()
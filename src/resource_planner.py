@@ -0,0 +1,209 @@
+"""
+CPU planning for nested-parallel hyperparameter search.
+
+RandomizedSearchCV(n_jobs=-1) starts one worker per core, and XGBoost, CatBoost,
+HistGradientBoosting (OpenMP), RandomForest and KNN then start a thread per core
+inside every worker. ResourcePlanner splits the core budget per model between
+outer search workers and the model's inner threads: it picks the pair that
+minimizes the estimated wall time (fit waves divided by an Amdahl speedup of the
+inner threads), sets the library's thread parameter, and caps OpenMP/BLAS pools
+in the workers through joblib's inner_max_num_threads. The refit of the best
+candidate runs alone in the parent process and gets the whole core budget.
+
+    python -m src.resource_planner --models XGBRegressor CatBoostRegressor HistGradientBoostingRegressor
+
+times the same search with the current defaults and with the planner (median of
+alternating repeats).
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from joblib import parallel_backend
+from sklearn.multioutput import MultiOutputRegressor
+
+from src.exception import CustomException
+from src.logger import logging
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # threadpoolctl is optional, BLAS/OpenMP limits are then left to joblib
+    threadpool_limits = None
+
+# Constructor parameter each library uses for its own thread count
+INNER_THREAD_PARAMS = {
+    "XGBRegressor": "n_jobs",
+    "CatBoostRegressor": "thread_count",
+    "RandomForestRegressor": "n_jobs",
+    "KNeighborsRegressor": "n_jobs",
+}
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@dataclass
+class ResourcePlannerConfig:
+    total_cores: int = field(default_factory=available_cores)
+    max_inner_threads: int = 16
+    # Parallel fraction of one fit per model (Amdahl); models not listed are single-threaded
+    parallel_fraction: dict = field(default_factory=lambda: {
+        "XGBRegressor": 0.9,
+        "CatBoostRegressor": 0.9,
+        "HistGradientBoostingRegressor": 0.85,
+        "RandomForestRegressor": 0.95,
+        "KNeighborsRegressor": 0.7,
+        "LinearRegression": 0.5,
+    })
+
+
+@dataclass
+class ResourcePlan:
+    model_name: str
+    outer_n_jobs: int
+    inner_threads: int
+    estimated_waves: int
+    # The search's final refit runs alone in the parent process, so it gets the whole budget
+    refit_threads: int = 1
+
+    def _thread_params(self, model, threads):
+        param = INNER_THREAD_PARAMS.get(self.model_name)
+        if param is None:
+            return {}
+        # Not hasattr(model, "estimator"): every sklearn ensemble has that attribute too
+        prefix = "estimator__" if isinstance(model, MultiOutputRegressor) else ""
+        return {prefix + param: threads}
+
+    def inner_params(self, model):
+        """set_params() arguments giving model inner_threads threads (inside MultiOutputRegressor too)."""
+        return self._thread_params(model, self.inner_threads)
+
+    def refit_params(self, model):
+        """set_params() arguments giving the refit of the best candidate refit_threads threads."""
+        return self._thread_params(model, self.refit_threads)
+
+    def restore_params(self, model):
+        """Current values of the params inner_params() overrides, to put back after the search."""
+        current = model.get_params()
+        # CatBoost leaves unset params out of get_params(); -1 is its "all cores" default
+        return {name: current.get(name, -1 if name.endswith("thread_count") else None) for name in self.inner_params(model)}
+
+    def outer_context(self):
+        """Backend for the search: outer_n_jobs loky workers with inner_threads OpenMP/BLAS threads each."""
+        return parallel_backend("loky", n_jobs=self.outer_n_jobs, inner_max_num_threads=self.inner_threads)
+
+    def inner_context(self):
+        """Thread pool limits for a fit in the current process (no outer search)."""
+        if threadpool_limits is None:
+            return contextlib.nullcontext()
+        return threadpool_limits(limits=self.inner_threads)
+
+    def refit_context(self):
+        """Thread pool limits for the refit after the search, at refit_threads."""
+        if threadpool_limits is None:
+            return contextlib.nullcontext()
+        return threadpool_limits(limits=self.refit_threads)
+
+
+class ResourcePlanner:
+    def __init__(self, config=None):
+        self.resource_planner_config = config or ResourcePlannerConfig()
+
+    @staticmethod
+    def _speedup(threads, parallel_fraction):
+        return 1.0 / ((1.0 - parallel_fraction) + parallel_fraction / threads)
+
+    def plan(self, model_name, n_tasks):
+        """Split the cores between n_tasks independent fits of model_name."""
+        config = self.resource_planner_config
+        cores = max(1, config.total_cores)
+        fraction = config.parallel_fraction.get(model_name, 0.0)
+        max_inner = min(config.max_inner_threads, cores) if fraction > 0 else 1
+
+        best = None
+        for inner in range(1, max_inner + 1):
+            outer = max(1, min(n_tasks, cores // inner))
+            waves = math.ceil(n_tasks / outer)
+            cost = waves / self._speedup(inner, fraction)
+            if best is None or cost < best[0] - 1e-9:
+                best = (cost, outer, inner, waves)
+
+        _, outer, inner, waves = best
+        plan = ResourcePlan(model_name, outer, inner, waves, refit_threads=max_inner)
+        logging.info(
+            f"{model_name}: {n_tasks} fits on {cores} cores -> {outer} workers x {inner} threads, "
+            f"refit with {max_inner} threads"
+        )
+        return plan
+
+
+def benchmark_resource_planner(model_names=None, train_array_path=None, test_array_path=None, output_path=None, repeats=3):
+    """
+    Tune each model on the pipeline's transformed arrays with the current defaults
+    (n_jobs=-1 and library defaults) and with the planner, `repeats` times each in
+    alternating order so neither mode always runs cold, and report the median wall
+    time of each.
+    """
+    from src.components.model_trainer import ModelTrainer
+    from src.pipeline.train_pipeline import _array_path
+    from src.utils import evaluate_model
+
+    try:
+        train_array = np.load(train_array_path or _array_path("train_arr"))
+        test_array = np.load(test_array_path or _array_path("test_arr"))
+        X_train, y_train = train_array[:, :-1], train_array[:, -1]
+        X_test, y_test = test_array[:, :-1], test_array[:, -1]
+
+        model_names = model_names or ["XGBRegressor", "CatBoostRegressor", "HistGradientBoostingRegressor", "RandomForestRegressor"]
+        results = []
+        for model_name in model_names:
+            row = {"model": model_name, "repeats": repeats}
+            modes = [("default", None), ("planned", ResourcePlanner())]
+            timings = {mode: [] for mode, _ in modes}
+            for repeat in range(repeats):
+                for mode, planner in (modes if repeat % 2 == 0 else modes[::-1]):
+                    models, param = ModelTrainer().get_models_and_params()
+                    start = time.perf_counter()
+                    report = evaluate_model(
+                        X_train, y_train, X_test, y_test,
+                        {model_name: models[model_name]}, {model_name: param[model_name]},
+                        resource_planner=planner,
+                    )
+                    timings[mode].append(time.perf_counter() - start)
+                    row[f"{mode}_r2"] = report[model_name]
+            for mode, seconds in timings.items():
+                row[f"{mode}_seconds"] = float(np.median(seconds))
+                row[f"{mode}_all_seconds"] = seconds
+            row["speedup"] = row["default_seconds"] / row["planned_seconds"]
+            logging.info(f"Resource planner benchmark: {row}")
+            results.append(row)
+
+        if output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, "w") as output_file:
+                json.dump({"total_cores": available_cores(), "results": results}, output_file, indent=2)
+        return results
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare search wall time with and without the CPU planner")
+    parser.add_argument("--models", nargs="+")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per mode, alternating order; the median is reported")
+    parser.add_argument("--output", default=os.path.join("artifacts", "resource_planner_benchmark.json"))
+    args = parser.parse_args()
+    for row in benchmark_resource_planner(args.models, output_path=args.output, repeats=args.repeats):
+        print(
+            f"{row['model']:<32} default {row['default_seconds']:8.2f}s  "
+            f"planned {row['planned_seconds']:8.2f}s  x{row['speedup']:.2f}"
+        )
@@ -0,0 +1,233 @@
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, fall back to /proc and resource
+    psutil = None
+
+
+@dataclass
+class TrainingProfilerConfig:
+    trace_dir: str = os.path.join("artifacts", "training_trace")
+    sample_interval_seconds: float = 0.01
+    # "default" keeps library output as is, "silence" disables it, any other value
+    # is used as the directory libraries write their per-fit files to
+    library_output: str = "default"
+
+
+def _current_rss_and_threads():
+    if psutil is not None:
+        process = psutil.Process()
+        return process.memory_info().rss, process.num_threads()
+    rss, threads = 0, threading.active_count()
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return rss, threads
+
+
+class _ResourceSampler(threading.Thread):
+    """Polls RSS and native thread count while a fit runs, keeping the maxima."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_rss, self.peak_threads = _current_rss_and_threads()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss, threads = _current_rss_and_threads()
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_threads = max(self.peak_threads, threads)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _ProfiledFitMixin:
+    """
+    Records wall time, CPU time, peak RSS and thread count of every fit() call.
+    Runs inside the CV worker processes and appends one JSON line per fit to a
+    per-process file in the trace directory, which the parent merges afterwards.
+    """
+
+    _profile_model_name = None
+    _profile_trace_dir = None
+    _profile_sample_interval = 0.01
+
+    def fit(self, X, y=None, *args, **kwargs):
+        sampler = _ResourceSampler(self._profile_sample_interval)
+        sampler.start()
+        start_epoch = time.time()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            return super().fit(X, y, *args, **kwargs)
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            sampler.stop()
+            record = {
+                "model": self._profile_model_name,
+                "params": {k: repr(v) for k, v in self.get_params(deep=False).items()},
+                "n_samples": int(len(y)) if y is not None else None,
+                "y_sum": round(float(y.sum()), 6) if y is not None else None,
+                "start_us": start_epoch * 1e6,
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "peak_rss_bytes": sampler.peak_rss,
+                "peak_threads": sampler.peak_threads,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            path = os.path.join(self._profile_trace_dir, f"fits_{os.getpid()}.jsonl")
+            with open(path, "a") as trace_file:
+                trace_file.write(json.dumps(record) + "\n")
+
+
+class TrainingProfiler:
+    """
+    Per-fit training trace for evaluate_model.
+
+    wrap() swaps an estimator for a subclass that profiles fit(), unwrap() restores
+    the original class on the fitted estimator, and export() writes the merged
+    records as a Chrome trace (chrome://tracing / Perfetto) and a summary table.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or TrainingProfilerConfig()
+        os.makedirs(self.config.trace_dir, exist_ok=True)
+        for file_name in os.listdir(self.config.trace_dir):
+            if file_name.startswith("fits_") and file_name.endswith(".jsonl"):
+                os.remove(os.path.join(self.config.trace_dir, file_name))
+        self._fold_ids = {}
+        self._classes = {}
+
+    def register_folds(self, y_train, splits):
+        """Fingerprint each CV training fold so worker records can be matched to it."""
+        for fold, (train_idx, _) in enumerate(splits):
+            y_fold = y_train[train_idx]
+            self._fold_ids[(len(y_fold), round(float(y_fold.sum()), 6))] = str(fold)
+        self._fold_ids[(len(y_train), round(float(y_train.sum()), 6))] = "refit"
+
+    def configure_library_output(self, model):
+        """Redirect or silence files libraries write on every fit (catboost_info/)."""
+        mode = self.config.library_output
+        if mode == "default":
+            return model
+        # Inside a MultiOutputRegressor the setting goes to the wrapped estimator
+        inner, prefix = model, ""
+        if hasattr(model, "estimator") and hasattr(model.estimator, "get_all_params"):
+            inner, prefix = model.estimator, "estimator__"
+        # CatBoost's get_params() lists only explicitly set params, so detect it by type
+        if not hasattr(inner, "get_all_params"):
+            return model
+        if mode == "silence":
+            model.set_params(**{prefix + "allow_writing_files": False})
+        else:
+            os.makedirs(mode, exist_ok=True)
+            model.set_params(**{prefix + "train_dir": mode})
+        return model
+
+    def wrap(self, model_name, model):
+        # The model name lives on the class so it survives sklearn's clone()
+        base = type(model)
+        if model_name not in self._classes:
+            self._classes[model_name] = type(
+                f"Profiled{base.__name__}",
+                (_ProfiledFitMixin, base),
+                {
+                    "_profile_model_name": model_name,
+                    "_profile_trace_dir": os.path.abspath(self.config.trace_dir),
+                    "_profile_sample_interval": self.config.sample_interval_seconds,
+                },
+            )
+        wrapped = self.configure_library_output(model)
+        wrapped.__class__ = self._classes[model_name]
+        return wrapped
+
+    @staticmethod
+    def unwrap(model):
+        if isinstance(model, _ProfiledFitMixin):
+            # MRO is (Profiled<Base>, _ProfiledFitMixin, <Base>, ...)
+            model.__class__ = type(model).__mro__[2]
+        return model
+
+    def records(self):
+        rows = []
+        for file_name in sorted(os.listdir(self.config.trace_dir)):
+            if file_name.startswith("fits_") and file_name.endswith(".jsonl"):
+                with open(os.path.join(self.config.trace_dir, file_name)) as trace_file:
+                    rows.extend(json.loads(line) for line in trace_file if line.strip())
+        for row in rows:
+            row["fold"] = self._fold_ids.get((row["n_samples"], row["y_sum"]), "unknown")
+        return rows
+
+    def export(self):
+        """Write trace.json (Chrome trace events) and summary.csv, return the summary."""
+        try:
+            rows = self.records()
+            events = [
+                {
+                    "name": f"{row['model']} fold {row['fold']}",
+                    "cat": row["model"],
+                    "ph": "X",
+                    "ts": row["start_us"],
+                    "dur": row["wall_seconds"] * 1e6,
+                    "pid": row["pid"],
+                    "tid": row["tid"],
+                    "args": {
+                        "params": row["params"],
+                        "cpu_seconds": row["cpu_seconds"],
+                        "peak_rss_mb": row["peak_rss_bytes"] / 2 ** 20,
+                        "peak_threads": row["peak_threads"],
+                    },
+                }
+                for row in rows
+            ]
+            trace_path = os.path.join(self.config.trace_dir, "trace.json")
+            with open(trace_path, "w") as trace_file:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+            if not rows:
+                return pd.DataFrame()
+            df = pd.DataFrame(rows)
+            summary = (
+                df.groupby("model")
+                .agg(
+                    fits=("wall_seconds", "size"),
+                    total_wall_seconds=("wall_seconds", "sum"),
+                    max_wall_seconds=("wall_seconds", "max"),
+                    total_cpu_seconds=("cpu_seconds", "sum"),
+                    peak_rss_mb=("peak_rss_bytes", lambda s: s.max() / 2 ** 20),
+                    peak_threads=("peak_threads", "max"),
+                )
+                .sort_values("total_wall_seconds", ascending=False)
+            )
+            summary.to_csv(os.path.join(self.config.trace_dir, "summary.csv"))
+            df.drop(columns=["start_us"]).to_csv(os.path.join(self.config.trace_dir, "fits.csv"), index=False)
+
+            logging.info(f"Training trace written to {trace_path}")
+            logging.info(f"Training profile summary:\n{summary.to_string()}")
+            return summary
+        except Exception as e:
+            raise CustomException(e, sys)
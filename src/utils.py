@@ -1,11 +1,18 @@
 import os
 import sys
+import contextlib
 
 import pandas as pd
 import numpy as np
 import dill
+import joblib
 import time
+import pickle
+import shutil
+import tempfile
 from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GroupKFold, KFold
+from sklearn.base import clone
 from sklearn.metrics import r2_score
 from sklearn.model_selection import RandomizedSearchCV
 from scipy.stats import randint
@@ -25,22 +32,251 @@ def save_object(file_path, obj):
         raise CustomException(e, sys)
     
     
+class TrainingDataContext:
+    """
+    Training data shared by every model evaluated in evaluate_model.
+
+    X_train/y_train are written once to .npy memmaps so the CV workers spawned by
+    RandomizedSearchCV receive a file reference instead of a pickled copy of the
+    arrays, and the fold indices are built once and reused for every estimator.
+    transfer_report() only estimates the saving; benchmark_data_transfer() measures
+    it on real loky dispatch.
+    """
+
+    def __init__(self, X_train, y_train, cv=3, temp_folder=None, groups=None):
+        try:
+            self.cv = cv
+            self.n_tasks = 0
+            self._source_arrays = (X_train, y_train)
+            self._temp_dir = tempfile.mkdtemp(prefix="training_data_", dir=temp_folder)
+
+            self.X_train = self._to_memmap(X_train, "X_train.npy")
+            self.y_train = self._to_memmap(y_train, "y_train.npy")
+
+            # Same folds RandomizedSearchCV(cv=3) builds for a regressor, computed once;
+            # with groups, rows of one group (e.g. masked copies of a student) share a fold
+            if groups is not None:
+                self.splits = list(GroupKFold(n_splits=cv).split(self.X_train, groups=groups))
+            else:
+                self.splits = list(KFold(n_splits=cv).split(self.X_train))
+
+            logging.info(
+                f"Training data context ready: {self.X_train.shape} in {self._temp_dir}, "
+                f"{len(self.splits)} folds precomputed"
+            )
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _to_memmap(self, array, file_name):
+        array = np.ascontiguousarray(array)
+        path = os.path.join(self._temp_dir, file_name)
+        mmap = np.lib.format.open_memmap(path, mode="w+", dtype=array.dtype, shape=array.shape)
+        mmap[...] = array
+        mmap.flush()
+        del mmap
+        return np.load(path, mmap_mode="r")
+
+    def record_tasks(self, n_tasks):
+        """Count the fits dispatched to worker processes."""
+        self.n_tasks += n_tasks
+
+    @staticmethod
+    def _memmap_reference(array):
+        # What joblib's memmap reducer ships to a worker: path, dtype, shape, offset
+        return (array.filename, array.dtype.str, array.shape, array.offset, "r")
+
+    @staticmethod
+    def _measure_transfer(payload):
+        start = time.perf_counter()
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.loads(data)
+        return len(data), time.perf_counter() - start
+
+    def transfer_report(self):
+        """
+        Model-based estimate, not a measurement, of inter-process transfer for the
+        recorded fits: one pickle round trip of the training arrays (before) and of
+        the memmap references (after), timed here once and multiplied by the number
+        of fits. joblib batches tasks and already memmaps arrays above its max_nbytes
+        threshold, so the real "before" cost can be lower; benchmark_data_transfer()
+        measures it.
+        """
+        before_bytes, before_time = self._measure_transfer(self._source_arrays)
+        after_bytes, after_time = self._measure_transfer(
+            (self._memmap_reference(self.X_train), self._memmap_reference(self.y_train))
+        )
+        return {
+            "n_tasks": self.n_tasks,
+            "estimated_bytes_before": before_bytes * self.n_tasks,
+            "estimated_bytes_after": after_bytes * self.n_tasks,
+            "estimated_seconds_before": before_time * self.n_tasks,
+            "estimated_seconds_after": after_time * self.n_tasks,
+        }
+
+    def close(self):
+        self.X_train = None
+        self.y_train = None
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def benchmark_data_transfer(X_train, y_train, model, param_grid, n_iter=5, cv=3, repeats=3):
+    """
+    Measured effect of TrainingDataContext on loky dispatch: wall time of the same
+    RandomizedSearchCV with the arrays pickled into every task (joblib's automatic
+    memmapping off) and with the shared memmaps, median of `repeats` runs each in
+    alternating order, plus the bytes of array data each mode ships per task.
+    """
+    from joblib import parallel_config
+
+    def timed_search(X, y, splits, max_nbytes):
+        search = RandomizedSearchCV(
+            clone(model), param_distributions=param_grid, n_iter=n_iter, cv=splits,
+            scoring='r2', n_jobs=-1, random_state=42
+        )
+        start = time.perf_counter()
+        with parallel_config(backend="loky", max_nbytes=max_nbytes):
+            search.fit(X, y)
+        return time.perf_counter() - start
+
+    try:
+        X_train, y_train = np.asarray(X_train), np.asarray(y_train)
+        with TrainingDataContext(X_train, y_train, cv=cv) as data_context:
+            modes = {
+                "pickled": lambda: timed_search(X_train, y_train, data_context.splits, None),
+                "memmapped": lambda: timed_search(data_context.X_train, data_context.y_train, data_context.splits, "1M"),
+            }
+            timings = {name: [] for name in modes}
+            for repeat in range(repeats):
+                order = list(modes) if repeat % 2 == 0 else list(modes)[::-1]
+                for name in order:
+                    timings[name].append(modes[name]())
+            memmap_bytes = len(pickle.dumps(
+                (data_context._memmap_reference(data_context.X_train), data_context._memmap_reference(data_context.y_train))
+            ))
+
+        report = {
+            "n_tasks_per_search": n_iter * cv,
+            "pickled_seconds": float(np.median(timings["pickled"])),
+            "memmapped_seconds": float(np.median(timings["memmapped"])),
+            "pickled_bytes_per_task": X_train.nbytes + y_train.nbytes,
+            "memmapped_bytes_per_task": memmap_bytes,
+        }
+        report["seconds_saved"] = report["pickled_seconds"] - report["memmapped_seconds"]
+        logging.info(f"Measured CV data transfer: {report}")
+        return report
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def measure_serving_cost(model, X_sample, batch_size=1000, repeats=50):
+    """
+    Serving cost of a fitted model: median single-row and batch predict latency,
+    pickled artifact size and the time load_object takes to read it back.
+    """
+    X_sample = np.asarray(X_sample)
+    single_row = X_sample[:1]
+    batch = np.resize(X_sample, (batch_size,) + X_sample.shape[1:])
+
+    model.predict(single_row)  # warm-up: lazy init, first-call allocations
+    single_row_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(single_row)
+        single_row_times.append(time.perf_counter() - start)
+
+    batch_times = []
+    for _ in range(max(3, repeats // 10)):
+        start = time.perf_counter()
+        model.predict(batch)
+        batch_times.append(time.perf_counter() - start)
 
+    temp_dir = tempfile.mkdtemp(prefix="serving_cost_")
+    try:
+        artifact_path = os.path.join(temp_dir, "model.pkl")
+        save_object(artifact_path, model)
+        start = time.perf_counter()
+        load_object(artifact_path)
+        load_seconds = time.perf_counter() - start
+        artifact_size_bytes = os.path.getsize(artifact_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        "single_row_latency_ms": float(np.median(single_row_times) * 1000),
+        "batch_latency_ms": float(np.median(batch_times) * 1000),
+        "batch_size": batch_size,
+        "artifact_size_bytes": artifact_size_bytes,
+        "load_seconds": load_seconds,
+    }
 
-def evaluate_model(X_train, y_train, X_test, y_test, models, param):
+
+class MaskedTargetScorer:
+    """
+    R² of a multi-target model over the hidden targets only.
+
+    Rows built by mask_known_scores pass some targets in as inputs; predicting
+    those back is trivial, so each target is scored only on the rows whose
+    missing-indicator column (scaled, > 0 when missing) marks it as hidden, and
+    the per-target R² values are averaged like r2_score's uniform_average.
+    Usable as RandomizedSearchCV scoring: called with (estimator, X, y).
+    """
+
+    def __init__(self, indicator_columns):
+        self.indicator_columns = list(indicator_columns)
+
+    def target_mask(self, X):
+        return np.asarray(X[:, self.indicator_columns]) > 0
+
+    def per_target(self, y_true, y_pred, mask):
+        return [
+            r2_score(y_true[mask[:, i], i], y_pred[mask[:, i], i])
+            for i in range(y_true.shape[1])
+        ]
+
+    def __call__(self, estimator, X, y):
+        y_true = np.asarray(y)
+        return float(np.mean(self.per_target(y_true, estimator.predict(X), self.target_mask(X))))
+
+
+def evaluate_model(X_train, y_train, X_test, y_test, models, param, data_context=None, profiler=None, serving_costs=None, resource_planner=None, scoring=None, groups=None):
     """
     Enhanced evaluate_model with comprehensive logging for hyperparameter tuning
+
+    If no TrainingDataContext is given, one is built for the duration of the call
+    so all models share the same memmapped training data and CV folds. With a
+    TrainingProfiler every fit (candidate x fold, and the refit) is traced. If a
+    serving_costs dict is given, it is filled with measure_serving_cost() per model.
+    A ResourcePlanner splits the cores between search workers and each model's
+    inner threads; the chosen models get their library thread defaults back.
+    A scoring callable (estimator, X, y), e.g. MaskedTargetScorer, replaces R²
+    for both the search and the test score. groups keeps related training rows in
+    the same CV fold (GroupKFold).
     """
+    owns_context = data_context is None
     try:
         report = {}
         
         logging.info("Starting model evaluation with hyperparameter tuning...")
         total_start_time = time.time()
+
+        if owns_context:
+            data_context = TrainingDataContext(X_train, y_train, cv=3, groups=groups)
+        X_train, y_train = data_context.X_train, data_context.y_train
+        if profiler is not None:
+            profiler.register_folds(y_train, data_context.splits)
        
         for i in range(len(list(models))):
             model = list(models.values())[i]
             model_name = list(models.keys())[i]
             param_grid = param[model_name]
+            if profiler is not None:
+                model = profiler.wrap(model_name, model)
             
             logging.info(f"Evaluating {model_name}...")
             model_start_time = time.time()
@@ -49,10 +285,24 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param):
             if model_name == "LinearRegression" or not param_grid:
                 # No hyperparameters to tune, just fit the model
                 logging.info(f"{model_name}: No hyperparameters to tune, fitting model directly")
-                model.fit(X_train, y_train)
-                y_test_pred = model.predict(X_test)
-                test_model_score = r2_score(y_test, y_test_pred)
+                fit_context, restore_params = contextlib.nullcontext(), {}
+                if resource_planner is not None:
+                    plan = resource_planner.plan(model_name, 1)
+                    restore_params = plan.restore_params(model)
+                    model.set_params(**plan.inner_params(model))
+                    fit_context = plan.inner_context()
+                with fit_context:
+                    model.fit(X_train, y_train)
+                model.set_params(**restore_params)
+                if profiler is not None:
+                    models[model_name] = profiler.unwrap(model)
+                if scoring is not None:
+                    test_model_score = scoring(model, X_test, y_test)
+                else:
+                    test_model_score = r2_score(y_test, model.predict(X_test))
                 report[model_name] = test_model_score
+                if serving_costs is not None:
+                    serving_costs[model_name] = measure_serving_cost(models[model_name], X_test)
                 
                 model_end_time = time.time()
                 model_time = model_end_time - model_start_time
@@ -70,25 +320,46 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param):
             
             logging.info(f"{model_name}: {total_combinations} possible combinations, testing {n_iter} iterations")
             
+            n_jobs, search_context, restore_params = -1, contextlib.nullcontext(), {}
+            if resource_planner is not None:
+                plan = resource_planner.plan(model_name, n_iter * len(data_context.splits))
+                restore_params = plan.restore_params(model)
+                model.set_params(**plan.inner_params(model))
+                n_jobs, search_context = plan.outer_n_jobs, plan.outer_context()
+            
             # Perform hyperparameter tuning
             search = RandomizedSearchCV(
                 estimator=model,
                 param_distributions=param_grid,
                 n_iter=n_iter,  
-                cv=3,
-                scoring='r2',
-                n_jobs=-1,
+                cv=data_context.splits,
+                scoring=scoring or 'r2',
+                n_jobs=n_jobs,
                 random_state=42,
-                verbose=0
+                verbose=0,
+                # With a plan, the refit below runs alone and gets every core, not inner_threads
+                refit=resource_planner is None
             )
            
             tuning_start_time = time.time()
-            search.fit(X_train, y_train)
+            with search_context:
+                search.fit(X_train, y_train)
+            if resource_planner is not None:
+                best_model = clone(model).set_params(**search.best_params_)
+                best_model.set_params(**plan.refit_params(best_model))
+                with plan.refit_context():
+                    best_model.fit(X_train, y_train)
+            else:
+                best_model = search.best_estimator_
+            data_context.record_tasks(n_iter * len(data_context.splits))
             tuning_end_time = time.time()
             tuning_time = tuning_end_time - tuning_start_time
            
-            # Get the best model
-            best_model = search.best_estimator_
+            # Serve with the library's own thread defaults, not the search-time split
+            best_model.set_params(**restore_params)
+            if profiler is not None:
+                best_model = profiler.unwrap(best_model)
+                profiler.unwrap(model)
             
             # Log best parameters
             logging.info(f"{model_name}: Best parameters found: {search.best_params_}")
@@ -96,13 +367,18 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param):
             logging.info(f"{model_name}: Hyperparameter tuning completed in {tuning_time:.2f}s")
            
             # Predict on test set
-            y_test_pred = best_model.predict(X_test)
-            test_model_score = r2_score(y_test, y_test_pred)
+            if scoring is not None:
+                test_model_score = scoring(best_model, X_test, y_test)
+            else:
+                test_model_score = r2_score(y_test, best_model.predict(X_test))
            
             # Save the best model
             models[model_name] = best_model
            
             report[model_name] = test_model_score
+            if serving_costs is not None:
+                serving_costs[model_name] = measure_serving_cost(best_model, X_test)
+                logging.info(f"{model_name}: Serving cost {serving_costs[model_name]}")
             
             model_end_time = time.time()
             model_time = model_end_time - model_start_time
@@ -137,18 +413,35 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param):
         sorted_models = sorted(report.items(), key=lambda x: x[1], reverse=True)
         for rank, (model_name, score) in enumerate(sorted_models, 1):
             logging.info(f"  {rank}. {model_name}: {score:.4f}")
+
+        if profiler is not None:
+            profiler.export()
+
+        transfer = data_context.transfer_report()
+        logging.info(
+            f"Estimated CV data transfer over {transfer['n_tasks']} fits (model-based: one local pickle round trip x fits, "
+            f"not measured on dispatch; see benchmark_data_transfer): "
+            f"~{transfer['estimated_bytes_before']} bytes / ~{transfer['estimated_seconds_before']:.4f}s pickling the arrays per task (before), "
+            f"~{transfer['estimated_bytes_after']} bytes / ~{transfer['estimated_seconds_after']:.4f}s with shared memmap (after)"
+        )
        
         return report
    
     except Exception as e:
         logging.error(f"Error in model evaluation: {str(e)}")
         raise CustomException(e, sys)
+
+    finally:
+        if owns_context and data_context is not None:
+            data_context.close()
     
 def load_object(file_path):
     """
-    Load an object from a file using dill.
+    Load an object from a file using dill, or joblib for compressed .joblib artifacts.
     """
     try:
+        if file_path.endswith(".joblib"):
+            return joblib.load(file_path)
         with open(file_path, "rb") as file_obj:
             return dill.load(file_obj)
         